@@ -0,0 +1,199 @@
+import heapq
+from bisect import bisect_left, bisect_right
+from itertools import islice
+
+from django.db import transaction
+
+from foodgram.changelog import ChangeLog
+from ingredients.models import Ingredient, IngredientChange
+
+# Сколько изменений копится поверх основного списка, прежде чем
+# он будет пересобран.
+OVERLAY_LIMIT = 64
+change_log = ChangeLog(IngredientChange, 'ingredient_index')
+
+
+def fold(value):
+    """Приводит строку к виду для сравнения без учёта регистра и ё."""
+    return value.casefold().replace('ё', 'е')
+
+
+class IngredientIndex:
+    """
+    Индекс ингредиентов в памяти процесса для автодополнения.
+
+    Хранит отсортированный список (название в нижнем регистре, id):
+    совпадения по началу названия ищутся бинарным поиском, затем
+    добавляются совпадения по подстроке, которые ищутся через str.find
+    в склеенной строке всех названий. Изменённые ингредиенты
+    записываются в журнал IngredientChange, и каждый процесс
+    перечитывает из БД только их. Изменения копятся в небольшом
+    списке поверх основного и вливаются в него пачкой, поэтому правка
+    одного ингредиента не пересобирает весь индекс.
+    """
+    def __init__(self):
+        self.position = None
+        self._keys = []
+        self._items = {}
+        self._text = ''
+        self._offsets = []
+        self._extra = {}
+        self._extra_keys = []
+        self._hidden = frozenset()
+
+    def _set(self, keys, items, position):
+        offsets = []
+        offset = 0
+        for key, _ in keys:
+            offsets.append(offset)
+            offset += len(key) + 1
+        (self._keys, self._items, self._text, self._offsets, self._extra,
+         self._extra_keys, self._hidden, self.position) = (
+            keys, items, '\n'.join(key for key, _ in keys), offsets, {},
+            [], frozenset(), position
+        )
+
+    def build(self, rows, position=None):
+        """Строит индекс из строк (id, название, единица измерения)."""
+        items = {
+            pk: {'id': pk, 'name': name, 'measurement_unit': unit}
+            for pk, name, unit in rows
+        }
+        keys = sorted((fold(item['name']), pk) for pk, item in items.items())
+        self._set(keys, items, position)
+
+    def invalidate(self):
+        """Требует перестроить индекс во всех процессах."""
+        change_log.invalidate()
+
+    def ensure_fresh(self):
+        """Применяет новые записи журнала или перестраивает индекс."""
+        pending = change_log.pending(self.position)
+        if pending is None:
+            position = change_log.start()
+            self.build(
+                Ingredient.objects.values_list(
+                    'id', 'name', 'measurement_unit'
+                ),
+                position
+            )
+            return
+        position, ingredient_ids = pending
+        if ingredient_ids:
+            self._apply(ingredient_ids, position)
+        else:
+            self.position = position
+
+    def refresh(self, ingredient_ids):
+        """
+        Записывает изменение ингредиентов в журнал после фиксации
+        транзакции: при откате в автодополнении не останется
+        ингредиентов, которых нет в БД (например, после предпросмотра
+        импорта в админке). Текущий процесс сразу применяет изменение,
+        остальные - при следующем поиске.
+        """
+        ingredient_ids = {pk for pk in ingredient_ids if pk}
+        if ingredient_ids:
+            transaction.on_commit(lambda: self._refresh(ingredient_ids))
+
+    def _refresh(self, ingredient_ids):
+        pk = change_log.append(ingredient_ids)
+        if self.position is not None:
+            self._apply(ingredient_ids, self.position.advance([pk]))
+
+    def _apply(self, ingredient_ids, position):
+        changes = dict.fromkeys(ingredient_ids)
+        for pk, name, unit in Ingredient.objects.filter(
+            pk__in=ingredient_ids
+        ).values_list('id', 'name', 'measurement_unit'):
+            changes[pk] = {'id': pk, 'name': name, 'measurement_unit': unit}
+        self.update(changes, position)
+
+    def update(self, changes, position=None):
+        """
+        Применяет изменения {id: ингредиент или None для удалённого}.
+
+        Изменённые ингредиенты скрываются в основном списке и попадают
+        в дополнительный; когда их становится больше OVERLAY_LIMIT,
+        основной список пересобирается.
+        """
+        extra = dict(self._extra)
+        hidden = set(self._hidden)
+        for pk, item in changes.items():
+            extra.pop(pk, None)
+            if pk in self._items:
+                hidden.add(pk)
+            if item is not None:
+                extra[pk] = item
+        if len(extra) + len(hidden) > OVERLAY_LIMIT:
+            items = {
+                pk: item for pk, item in self._items.items()
+                if pk not in hidden
+            }
+            items.update(extra)
+            keys = sorted(
+                (fold(item['name']), pk) for pk, item in items.items()
+            )
+            self._set(keys, items, position)
+            return
+        self._extra, self._extra_keys, self._hidden, self.position = (
+            extra,
+            sorted((fold(item['name']), pk) for pk, item in extra.items()),
+            frozenset(hidden), position
+        )
+
+    def _prefix_matches(self, keys, hidden, query):
+        position = bisect_left(keys, (query,))
+        while position < len(keys) and keys[position][0].startswith(query):
+            if keys[position][1] not in hidden:
+                yield keys[position]
+            position += 1
+
+    def _substring_matches(self, keys, hidden, text, offsets, query):
+        """Названия, в которых query встречается не с начала."""
+        start = text.find(query)
+        while start != -1:
+            position = bisect_right(offsets, start) - 1
+            if (start != offsets[position]
+                    and keys[position][1] not in hidden):
+                yield keys[position]
+            if position + 1 == len(offsets):
+                return
+            start = text.find(query, offsets[position + 1])
+
+    def search(self, query, limit, refresh=True):
+        """
+        Возвращает не больше limit ингредиентов.
+
+        Сначала идут названия, начинающиеся с query,
+        затем названия, содержащие query.
+        """
+        if refresh:
+            self.ensure_fresh()
+        keys, items, text, offsets, extra, extra_keys, hidden = (
+            self._keys, self._items, self._text, self._offsets,
+            self._extra, self._extra_keys, self._hidden
+        )
+        query = fold(query).replace('\n', ' ')
+        prefix = self._prefix_matches(keys, hidden, query)
+        if extra_keys:
+            prefix = heapq.merge(prefix, [
+                key for key in extra_keys if key[0].startswith(query)
+            ])
+        found = [pk for _, pk in islice(prefix, limit)]
+        if query and len(found) < limit:
+            substring = self._substring_matches(
+                keys, hidden, text, offsets, query
+            )
+            if extra_keys:
+                substring = heapq.merge(substring, [
+                    key for key in extra_keys
+                    if query in key[0] and not key[0].startswith(query)
+                ])
+            found.extend(
+                pk for _, pk in islice(substring, limit - len(found))
+            )
+        return [extra[pk] if pk in extra else items[pk] for pk in found]
+
+
+ingredient_index = IngredientIndex()
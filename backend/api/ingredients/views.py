@@ -1,17 +1,51 @@
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import viewsets
 from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
 
+from django.conf import settings
+
+from api.ingredients.autocomplete import ingredient_index
 from api.ingredients.serializers import IngredientSerializer
+from api.utils.cache import CachedCatalogMixin, ingredients_cache
 from api.utils.filters import IngredientFilter
 from ingredients.models import Ingredient
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(CachedCatalogMixin, viewsets.ReadOnlyModelViewSet):
     """Класс представления об ингредиентах."""
+    catalog_cache = ingredients_cache
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (AllowAny, )
     filter_backends = (DjangoFilterBackend, )
     filterset_class = IngredientFilter
     pagination_class = None
+
+    def get_search_limit(self):
+        """Возвращает максимальное число ингредиентов в поиске."""
+        try:
+            limit = int(self.request.query_params['limit'])
+        except (KeyError, ValueError):
+            return settings.INGREDIENT_SEARCH_LIMIT
+        return max(1, min(limit, settings.INGREDIENT_SEARCH_LIMIT))
+
+    def list(self, request, *args, **kwargs):
+        """
+        Возвращает список ингредиентов.
+
+        Поиск по названию выполняется по индексу в памяти процесса,
+        если он не отключён в настройках.
+        """
+        name = request.query_params.get('name')
+        if name and settings.INGREDIENT_SEARCH_IN_MEMORY:
+            return Response(
+                ingredient_index.search(name, self.get_search_limit())
+            )
+        return super().list(request, *args, **kwargs)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action == 'list' and self.request.query_params.get('name'):
+            return queryset[:self.get_search_limit()]
+        return queryset
@@ -0,0 +1,23 @@
+from rest_framework import serializers
+
+from jobs.models import Job
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """Сериализатор для получения статуса фоновой задачи."""
+    class Meta:
+        model = Job
+        fields = (
+            'id', 'name', 'status', 'attempts',
+            'result', 'created_at', 'finished_at'
+        )
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        request = self.context.get('request')
+        result = data['result']
+        if request and isinstance(result, dict) and 'url' in result:
+            data['result'] = {
+                **result, 'url': request.build_absolute_uri(result['url'])
+            }
+        return data
@@ -0,0 +1,13 @@
+from rest_framework import mixins, viewsets
+
+from api.jobs.serializers import JobSerializer
+
+
+class JobViewSet(mixins.ListModelMixin,
+                 mixins.RetrieveModelMixin,
+                 viewsets.GenericViewSet):
+    """Статус фоновых задач, поставленных пользователем."""
+    serializer_class = JobSerializer
+
+    def get_queryset(self):
+        return self.request.user.jobs.all()
@@ -0,0 +1,148 @@
+import json
+import math
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from api.management.commands.benchmark_api import (
+    DEFAULT_SIZES,
+    create_base_data,
+    seed_recipes,
+)
+from recipes.models import Favorite, Recipe
+from users.models import User
+
+FAVORITES_PER_USER = 100
+# Имя сценария, URL. В URL подставляются значения из контекста прогона.
+SCENARIOS = (
+    ('recipes', '/admin/recipes/recipe/'),
+    ('recipes-page', '/admin/recipes/recipe/?p={last_page}'),
+    ('recipes-search', '/admin/recipes/recipe/?q=Рецепт 12'),
+    ('recipes-filter-tag', '/admin/recipes/recipe/?tags__id__exact={tag_id}'),
+    ('recipes-order-favorites', '/admin/recipes/recipe/?o=4'),
+    ('recipe-change', '/admin/recipes/recipe/{recipe_id}/change/'),
+    ('recipe-ingredients', '/admin/recipes/recipeingredient/'),
+    ('favorites', '/admin/recipes/favorite/'),
+    ('favorites-search', '/admin/recipes/favorite/?q=benchmark2'),
+    ('shopping-carts', '/admin/recipes/shoppingcart/'),
+    ('subscriptions', '/admin/users/subscription/'),
+    ('users', '/admin/users/user/'),
+    ('ingredients', '/admin/ingredients/ingredient/'),
+    ('ingredient-autocomplete',
+     '/admin/autocomplete/?app_label=recipes&model_name=recipeingredient'
+     '&field_name=ingredient&term=ингредиент 1'),
+    ('user-autocomplete',
+     '/admin/autocomplete/?app_label=recipes&model_name=recipe'
+     '&field_name=author&term=benchmark'),
+)
+
+
+def seed_favorites(state):
+    """Добавляет каждому автору рецепты в избранное."""
+    recipe_ids = list(Recipe.objects.order_by('-id').values_list(
+        'id', flat=True
+    )[:FAVORITES_PER_USER])
+    Favorite.objects.bulk_create(
+        (
+            Favorite(user=author, recipe_id=recipe_id)
+            for author in state['authors']
+            for recipe_id in recipe_ids
+        ),
+        batch_size=1000, ignore_conflicts=True
+    )
+
+
+def run_scenarios(client, context, repeat):
+    results = {}
+    for _ in range(repeat):
+        for name, url in SCENARIOS:
+            url = url.format(**context)
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = client.get(url)
+                elapsed = (time.perf_counter() - started) * 1000
+            result = results.setdefault(name, {
+                'url': url, 'statuses': [], 'queries': 0, 'timings': [],
+            })
+            result['statuses'].append(response.status_code)
+            result['queries'] = max(result['queries'], len(queries))
+            result['timings'].append(elapsed)
+    for result in results.values():
+        timings = sorted(result.pop('timings'))
+        result['statuses'] = sorted(set(result['statuses']))
+        result['latency_ms'] = {
+            'median': round(statistics.median(timings), 2),
+            'p95': round(timings[math.ceil(0.95 * len(timings)) - 1], 2),
+            'max': round(timings[-1], 2),
+        }
+    return results
+
+
+class Command(BaseCommand):
+    help = (
+        'Наполняет временную БД рецептами и измеряет время ответа '
+        'и количество SQL-запросов страниц админки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', nargs='+', type=int, default=DEFAULT_SIZES,
+            help='Количество рецептов в БД для каждого прогона.'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=3,
+            help='Сколько раз открывать каждую страницу.'
+        )
+        parser.add_argument(
+            '--output',
+            help='Файл для JSON-отчёта. По умолчанию отчёт выводится '
+                 'в stdout.'
+        )
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        try:
+            with tempfile.TemporaryDirectory() as media_root:
+                with override_settings(MEDIA_ROOT=media_root):
+                    report = self.run_benchmark(
+                        sorted(options['sizes']), options['repeat']
+                    )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        content = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(content)
+        else:
+            self.stdout.write(content)
+
+    def run_benchmark(self, sizes, repeat):
+        state = create_base_data()
+        admin = User.objects.create_superuser(
+            username='benchmark-admin', email='admin@example.com',
+            password='benchmark-password'
+        )
+        client = Client()
+        client.force_login(admin)
+        report = {'database': connection.vendor, 'sizes': {}}
+        for size in sizes:
+            seed_recipes(state, size)
+            seed_favorites(state)
+            self.stderr.write(f'Рецептов в БД: {size}')
+            context = {
+                'tag_id': state['tags'][0].id,
+                'recipe_id': state['free_recipe_id'],
+                'last_page': max(size // 100 - 1, 0),
+            }
+            report['sizes'][str(size)] = run_scenarios(
+                client, context, repeat
+            )
+        return report
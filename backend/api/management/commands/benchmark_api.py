@@ -0,0 +1,501 @@
+import json
+import math
+import statistics
+import tempfile
+import time
+from itertools import cycle
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from django import get_version
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Max
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+
+from api.utils.cache import recipe_responses
+from ingredients.models import Ingredient
+from recipes.ingredient_index import recipe_ingredient_index
+from recipes.models import (
+    Favorite,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+    SimilarRecipe,
+)
+from tags.models import Tag
+from users.models import Subscription, User
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+AUTHORS_AMOUNT = 100
+TAGS_AMOUNT = 8
+INGREDIENTS_AMOUNT = 2000
+INGREDIENTS_PER_RECIPE = 5
+TAGS_PER_RECIPE = 2
+VIEWER_COLLECTION_SIZE = 20
+BULK_SIZE = 50
+BATCH_SIZE = 1000
+PASSWORD = 'benchmark-password'
+IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAA'
+    'DUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=='
+)
+
+# Сценарий: (имя, метод, url, тело запроса, клиент, ожидаемый статус).
+# Клиент: anon - без токена, viewer - основной пользователь,
+# login - токен, полученный в сценарии token-login.
+SCENARIOS = (
+    ('tags-list', 'get', '/api/tags/', None, 'anon', 200),
+    ('tags-detail', 'get', '/api/tags/{tag_id}/', None, 'anon', 200),
+    ('ingredients-list', 'get', '/api/ingredients/', None, 'anon', 200),
+    ('ingredients-search', 'get', '/api/ingredients/?name=ингр',
+     None, 'anon', 200),
+    ('ingredients-detail', 'get', '/api/ingredients/{ingredient_id}/',
+     None, 'anon', 200),
+    ('recipes-list-anon', 'get', '/api/recipes/', None, 'anon', 200),
+    ('recipes-detail-anon', 'get', '/api/recipes/{recipe_id}/',
+     None, 'anon', 200),
+    ('recipes-list', 'get', '/api/recipes/', None, 'viewer', 200),
+    ('recipes-list-limit-50', 'get', '/api/recipes/?limit=50',
+     None, 'viewer', 200),
+    ('recipes-deep-page', 'get', '/api/recipes/?page={deep_page}',
+     None, 'viewer', 200),
+    ('recipes-cursor', 'get', '/api/recipes/?cursor=', None, 'viewer', 200),
+    ('recipes-filter-tags', 'get',
+     '/api/recipes/?tags={tag_slug}&tags={other_tag_slug}',
+     None, 'viewer', 200),
+    ('recipes-filter-author', 'get', '/api/recipes/?author={author_id}',
+     None, 'viewer', 200),
+    ('recipes-search', 'get', '/api/recipes/?search=Рецепт+{search_number}',
+     None, 'viewer', 200),
+    ('recipes-search-broad', 'get', '/api/recipes/?search=бенчмарка',
+     None, 'viewer', 200),
+    ('recipes-search-filtered', 'get',
+     '/api/recipes/?search=бенчмарка&tags={tag_slug}&author={author_id}',
+     None, 'viewer', 200),
+    ('recipes-by-ingredients', 'get',
+     '/api/recipes/by_ingredients/?ingredients={ingredient_id}'
+     '&ingredients={other_ingredient_id}&ingredients={third_ingredient_id}',
+     None, 'anon', 200),
+    ('recipes-similar', 'get', '/api/recipes/{favorite_recipe_id}/similar/',
+     None, 'anon', 200),
+    ('recipes-recommended', 'get', '/api/recipes/recommended/',
+     None, 'viewer', 200),
+    ('recipes-popular', 'get', '/api/recipes/?ordering=popular',
+     None, 'viewer', 200),
+    ('recipes-favorited', 'get', '/api/recipes/?is_favorited=1',
+     None, 'viewer', 200),
+    ('recipes-in-cart', 'get', '/api/recipes/?is_in_shopping_cart=1',
+     None, 'viewer', 200),
+    ('recipes-detail', 'get', '/api/recipes/{recipe_id}/',
+     None, 'viewer', 200),
+    ('recipes-create', 'post', '/api/recipes/', 'recipe', 'viewer', 201),
+    ('recipes-update', 'patch', '/api/recipes/{new_recipe_id}/',
+     'recipe', 'viewer', 200),
+    ('recipes-delete', 'delete', '/api/recipes/{new_recipe_id}/',
+     None, 'viewer', 204),
+    ('favorite-add', 'post', '/api/recipes/{free_recipe_id}/favorite/',
+     None, 'viewer', 201),
+    ('favorite-remove', 'delete', '/api/recipes/{free_recipe_id}/favorite/',
+     None, 'viewer', 204),
+    ('shopping-cart-add', 'post',
+     '/api/recipes/{free_recipe_id}/shopping_cart/', None, 'viewer', 201),
+    ('shopping-cart-remove', 'delete',
+     '/api/recipes/{free_recipe_id}/shopping_cart/', None, 'viewer', 204),
+    ('favorite-bulk-add', 'post', '/api/recipes/favorite/',
+     'bulk', 'viewer', 200),
+    ('favorite-bulk-remove', 'delete', '/api/recipes/favorite/',
+     'bulk', 'viewer', 200),
+    ('shopping-cart-bulk-add', 'post', '/api/recipes/shopping_cart/',
+     'bulk', 'viewer', 200),
+    ('shopping-cart-bulk-remove', 'delete', '/api/recipes/shopping_cart/',
+     'bulk', 'viewer', 200),
+    ('shopping-cart-download', 'get', '/api/recipes/download_shopping_cart/',
+     None, 'viewer', 200),
+    ('shopping-cart-download-pdf', 'get',
+     '/api/recipes/download_shopping_cart/?format=pdf', None, 'viewer', 200),
+    ('shopping-cart-export', 'post', '/api/recipes/export_shopping_cart/',
+     'export', 'viewer', 202),
+    ('jobs-list', 'get', '/api/jobs/', None, 'viewer', 200),
+    ('jobs-detail', 'get', '/api/jobs/{job_id}/', None, 'viewer', 200),
+    ('subscriptions', 'get', '/api/users/subscriptions/?recipes_limit=3',
+     None, 'viewer', 200),
+    ('subscribe', 'post', '/api/users/{free_author_id}/subscribe/',
+     None, 'viewer', 201),
+    ('unsubscribe', 'delete', '/api/users/{free_author_id}/subscribe/',
+     None, 'viewer', 204),
+    ('users-list', 'get', '/api/users/', None, 'viewer', 200),
+    ('users-list-limit-50', 'get', '/api/users/?limit=50', None, 'viewer',
+     200),
+    ('users-detail', 'get', '/api/users/{author_id}/', None, 'viewer', 200),
+    ('users-me', 'get', '/api/users/me/', None, 'viewer', 200),
+    ('token-login', 'post', '/api/auth/token/login/', 'login', 'anon', 200),
+    ('token-logout', 'post', '/api/auth/token/logout/', None, 'login', 204),
+)
+
+# Допустимое количество SQL-запросов на один вызов эндпоинта.
+DEFAULT_BUDGETS = {
+    'tags-list': {'queries': 1},
+    'tags-detail': {'queries': 1},
+    'ingredients-list': {'queries': 1},
+    'ingredients-search': {'queries': 2},
+    'ingredients-detail': {'queries': 1},
+    'recipes-list-anon': {'queries': 4},
+    'recipes-detail-anon': {'queries': 3},
+    'recipes-list': {'queries': 5},
+    'recipes-list-limit-50': {'queries': 5},
+    'recipes-deep-page': {'queries': 5},
+    'recipes-cursor': {'queries': 4},
+    'recipes-filter-tags': {'queries': 6},
+    'recipes-filter-author': {'queries': 6},
+    'recipes-search': {'queries': 6},
+    'recipes-by-ingredients': {'queries': 4},
+    'recipes-similar': {'queries': 1},
+    'recipes-recommended': {'queries': 5},
+    'recipes-popular': {'queries': 5},
+    'recipes-search-broad': {'queries': 6},
+    'recipes-search-filtered': {'queries': 7},
+    'recipes-favorited': {'queries': 5},
+    'recipes-in-cart': {'queries': 5},
+    'recipes-detail': {'queries': 4},
+    'recipes-create': {'queries': 19},
+    'recipes-update': {'queries': 14},
+    'recipes-delete': {'queries': 13},
+    'favorite-add': {'queries': 5},
+    'favorite-remove': {'queries': 4},
+    'shopping-cart-add': {'queries': 13},
+    'shopping-cart-remove': {'queries': 11},
+    'favorite-bulk-add': {'queries': 4},
+    'favorite-bulk-remove': {'queries': 4},
+    'shopping-cart-bulk-add': {'queries': 12},
+    'shopping-cart-bulk-remove': {'queries': 11},
+    'shopping-cart-download': {'queries': 2},
+    'shopping-cart-download-pdf': {'queries': 2},
+    'shopping-cart-export': {'queries': 4},
+    'jobs-list': {'queries': 3},
+    'jobs-detail': {'queries': 2},
+    'subscriptions': {'queries': 4},
+    'subscribe': {'queries': 8},
+    'unsubscribe': {'queries': 6},
+    'users-list': {'queries': 4},
+    'users-list-limit-50': {'queries': 4},
+    'users-detail': {'queries': 3},
+    'users-me': {'queries': 1},
+    'token-login': {'queries': 5},
+    # Удаление токена проходит через сигнал сброса кэша токенов.
+    'token-logout': {'queries': 4},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет временную БД рецептами, вызывает все эндпоинты API '
+        'и сохраняет отчёт о количестве запросов и времени ответа.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', nargs='+', type=int, default=DEFAULT_SIZES,
+            help='Количество рецептов в БД для каждого прогона.'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Сколько раз вызывать каждый эндпоинт.'
+        )
+        parser.add_argument(
+            '--budgets',
+            help='JSON-файл с бюджетами: {"имя": {"queries": n, '
+                 '"latency_ms": m}}. Дополняет бюджеты по умолчанию.'
+        )
+        parser.add_argument(
+            '--output',
+            help='Файл для JSON-отчёта. По умолчанию отчёт выводится '
+                 'в stdout.'
+        )
+
+    def handle(self, *args, **options):
+        budgets = {name: dict(budget)
+                   for name, budget in DEFAULT_BUDGETS.items()}
+        if options['budgets']:
+            with open(options['budgets'], encoding='utf-8') as file:
+                for name, budget in json.load(file).items():
+                    budgets.setdefault(name, {}).update(budget)
+
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        try:
+            with tempfile.TemporaryDirectory() as media_root:
+                with override_settings(MEDIA_ROOT=media_root):
+                    report = self.run_benchmark(
+                        sorted(options['sizes']), options['repeat'], budgets
+                    )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        content = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(content)
+        else:
+            self.stdout.write(content)
+
+        if report['violations']:
+            raise CommandError(
+                'Превышены бюджеты: ' + ', '.join(
+                    f'{item["endpoint"]} ({item["size"]})'
+                    for item in report['violations']
+                )
+            )
+
+    def run_benchmark(self, sizes, repeat, budgets):
+        report = {
+            'created': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'django': get_version(),
+            'repeat': repeat,
+            'sizes': {},
+            'violations': [],
+        }
+        state = create_base_data()
+        for size in sizes:
+            seed_recipes(state, size)
+            self.stderr.write(f'Рецептов в БД: {size}')
+            endpoints = {}
+            for name, result in run_scenarios(state, repeat).items():
+                budget = budgets.get(name, {})
+                result['budget'] = budget
+                endpoints[name] = result
+                if result['statuses'] != [result['expected_status']]:
+                    report['violations'].append({
+                        'endpoint': name,
+                        'size': size,
+                        'metric': 'status',
+                        'value': result['statuses'],
+                        'budget': result['expected_status'],
+                    })
+                for key, value in (
+                    ('queries', result['queries']),
+                    ('latency_ms', result['latency_ms']['p95']),
+                ):
+                    if key in budget and value > budget[key]:
+                        report['violations'].append({
+                            'endpoint': name,
+                            'size': size,
+                            'metric': key,
+                            'value': value,
+                            'budget': budget[key],
+                        })
+            report['sizes'][str(size)] = endpoints
+        return report
+
+
+def create_base_data():
+    """Создаёт пользователей, теги и ингредиенты для прогона."""
+    password = make_password(PASSWORD)
+    User.objects.bulk_create(
+        User(
+            username=f'benchmark{index}',
+            email=f'benchmark{index}@example.com',
+            first_name='Бенчмарк',
+            last_name=str(index),
+            password=password,
+        )
+        for index in range(AUTHORS_AMOUNT + 2)
+    )
+    users = list(User.objects.order_by('id'))
+    viewer, login_user, authors = users[0], users[1], users[2:]
+    Tag.objects.bulk_create(
+        Tag(name=f'Тег {index}', color=f'#{index:06x}', slug=f'tag{index}')
+        for index in range(TAGS_AMOUNT)
+    )
+    Ingredient.objects.bulk_create(
+        (
+            Ingredient(name=f'ингредиент {index}', measurement_unit='г')
+            for index in range(INGREDIENTS_AMOUNT)
+        ),
+        batch_size=BATCH_SIZE
+    )
+    Subscription.objects.bulk_create(
+        Subscription(user=viewer, author=author)
+        for author in authors[:VIEWER_COLLECTION_SIZE]
+    )
+    return {
+        'viewer': viewer,
+        'login_user': login_user,
+        'authors': authors,
+        'tags': list(Tag.objects.order_by('id')),
+        'ingredient_ids': list(
+            Ingredient.objects.order_by('id').values_list('id', flat=True)
+        ),
+        'token': Token.objects.create(user=viewer).key,
+    }
+
+
+def seed_recipes(state, size):
+    """Дополняет БД рецептами до заданного количества."""
+    tags = state['tags']
+    ingredient_ids = state['ingredient_ids']
+    authors = cycle(state['authors'])
+    existing = Recipe.objects.count()
+    while existing < size:
+        amount = min(BATCH_SIZE, size - existing)
+        last_id = Recipe.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+        Recipe.objects.bulk_create(
+            Recipe(
+                author=next(authors),
+                name=f'Рецепт {existing + index}',
+                text='Описание рецепта для бенчмарка. ' * 10,
+                image='recipes/benchmark.png',
+                cooking_time=index % 120 + 1,
+            )
+            for index in range(amount)
+        )
+        recipe_ids = Recipe.objects.filter(
+            id__gt=last_id
+        ).values_list('id', flat=True)
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(
+                recipe_id=recipe_id,
+                tag_id=tags[(recipe_id + shift) % len(tags)].id
+            )
+            for recipe_id in recipe_ids
+            for shift in range(TAGS_PER_RECIPE)
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe_id=recipe_id,
+                ingredient_id=ingredient_ids[
+                    (recipe_id * 7 + shift) % len(ingredient_ids)
+                ],
+                amount=shift + 1,
+            )
+            for recipe_id in recipe_ids
+            for shift in range(INGREDIENTS_PER_RECIPE)
+        )
+        existing += amount
+    # Рецепты созданы через bulk_create, минуя обновление индекса
+    # и сброс кэша ответов.
+    recipe_ingredient_index.invalidate()
+    recipe_responses.invalidate()
+
+    viewer = state['viewer']
+    collection = list(Recipe.objects.order_by('id').values_list(
+        'id', flat=True
+    )[:VIEWER_COLLECTION_SIZE + 1 + BULK_SIZE])
+    for model in (Favorite, ShoppingCart):
+        model.objects.filter(user=viewer).delete()
+        model.objects.bulk_create(
+            model(user=viewer, recipe_id=recipe_id)
+            for recipe_id in collection[:VIEWER_COLLECTION_SIZE]
+        )
+    # Похожие на избранное рецепты - самые новые, их нет в коллекции.
+    latest = list(Recipe.objects.order_by('-id').values_list(
+        'id', flat=True
+    )[:settings.SIMILAR_RECIPES_LIMIT])
+    SimilarRecipe.objects.all().delete()
+    SimilarRecipe.objects.bulk_create(
+        SimilarRecipe(
+            recipe_id=recipe_id, similar_id=similar_id, score=1 / position
+        )
+        for recipe_id in collection[:VIEWER_COLLECTION_SIZE]
+        for position, similar_id in enumerate(latest, 1)
+        if similar_id != recipe_id
+    )
+    state['free_recipe_id'] = collection[VIEWER_COLLECTION_SIZE]
+    state['bulk_recipe_ids'] = collection[VIEWER_COLLECTION_SIZE + 1:]
+
+
+def run_scenarios(state, repeat):
+    """Вызывает все сценарии и возвращает статистику по каждому."""
+    tags = state['tags']
+    context = {
+        'tag_id': tags[0].id,
+        'tag_slug': tags[0].slug,
+        'other_tag_slug': tags[1].slug,
+        'ingredient_id': state['ingredient_ids'][0],
+        'other_ingredient_id': state['ingredient_ids'][1],
+        'third_ingredient_id': state['ingredient_ids'][2],
+        'recipe_id': state['free_recipe_id'],
+        'free_recipe_id': state['free_recipe_id'],
+        'favorite_recipe_id': Favorite.objects.filter(
+            user=state['viewer']
+        ).values_list('recipe_id', flat=True).first(),
+        'author_id': state['authors'][0].id,
+        'free_author_id': state['authors'][-1].id,
+        'deep_page': max(Recipe.objects.count() // 6 // 2, 1),
+        'search_number': Recipe.objects.count() // 2,
+    }
+    payloads = {
+        'recipe': {
+            'name': 'Рецепт бенчмарка',
+            'text': 'Описание',
+            'cooking_time': 10,
+            'image': IMAGE,
+            'tags': [tag.id for tag in tags[:TAGS_PER_RECIPE]],
+            'ingredients': [
+                {'id': ingredient_id, 'amount': 10}
+                for ingredient_id in state['ingredient_ids'][:10]
+            ],
+        },
+        'bulk': {'recipes': state['bulk_recipe_ids']},
+        'export': {'format': 'csv'},
+        'login': {
+            'email': state['login_user'].email,
+            'password': PASSWORD,
+        },
+    }
+    clients = {'anon': APIClient(), 'viewer': APIClient()}
+    clients['viewer'].credentials(HTTP_AUTHORIZATION=f'Token {state["token"]}')
+
+    results = {}
+    for _ in range(repeat):
+        for name, method, url, payload, client, expected in SCENARIOS:
+            if client == 'login':
+                client = APIClient()
+                client.credentials(
+                    HTTP_AUTHORIZATION=f'Token {context["auth_token"]}'
+                )
+            else:
+                client = clients[client]
+            url = url.format(**context)
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = getattr(client, method)(
+                    url, payloads.get(payload), format='json'
+                )
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                elapsed = (time.perf_counter() - started) * 1000
+            if name == 'recipes-create' and response.status_code == 201:
+                context['new_recipe_id'] = response.data['id']
+            if name == 'shopping-cart-export' and response.status_code == 202:
+                context['job_id'] = response.data['id']
+            if name == 'token-login' and response.status_code == 200:
+                context['auth_token'] = response.data['auth_token']
+            result = results.setdefault(name, {
+                'method': method.upper(),
+                'url': url,
+                'expected_status': expected,
+                'statuses': [],
+                'queries': 0,
+                'timings': [],
+            })
+            result['statuses'].append(response.status_code)
+            result['queries'] = max(result['queries'], len(queries))
+            result['timings'].append(elapsed)
+
+    for result in results.values():
+        timings = sorted(result.pop('timings'))
+        result['statuses'] = sorted(set(result['statuses']))
+        result['latency_ms'] = {
+            'median': round(statistics.median(timings), 2),
+            'p95': round(timings[math.ceil(0.95 * len(timings)) - 1], 2),
+            'max': round(timings[-1], 2),
+        }
+    return results
@@ -0,0 +1,125 @@
+import base64
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from io import BytesIO
+
+from PIL import Image
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+
+from api.recipes.views import RecipeViewSet
+from ingredients.models import Ingredient
+from tags.models import Tag
+from users.models import User
+
+DEFAULT_WIDTHS = (800, 1600, 2400)
+JPEG_QUALITY = 95
+
+
+def make_image(width):
+    """Возвращает JPEG с шумом: такой файл почти не сжимается."""
+    height = width * 3 // 4
+    image = Image.frombytes(
+        'RGB', (width, height), os.urandom(width * height * 3)
+    )
+    buffer = BytesIO()
+    image.save(buffer, 'JPEG', quality=JPEG_QUALITY)
+    return buffer.getvalue()
+
+
+def measure(request):
+    """Обрабатывает запрос и возвращает статус, пик памяти и время."""
+    view = RecipeViewSet.as_view({'post': 'create'})
+    tracemalloc.start()
+    started = time.perf_counter()
+    response = view(request)
+    elapsed = (time.perf_counter() - started) * 1000
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    request.close()
+    return {
+        'status': response.status_code,
+        'peak_memory_kb': round(peak / 1024),
+        'latency_ms': round(elapsed, 2),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Измеряет пик памяти и время создания рецепта с картинкой, '
+        'переданной строкой base64 и файлом multipart/form-data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--widths', nargs='+', type=int, default=DEFAULT_WIDTHS,
+            help='Ширина картинок в пикселях, высота - 3/4 ширины.'
+        )
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        try:
+            with tempfile.TemporaryDirectory() as media_root:
+                with override_settings(MEDIA_ROOT=media_root):
+                    report = self.run_benchmark(sorted(options['widths']))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
+
+    def run_benchmark(self, widths):
+        user = User.objects.create(
+            username='benchmark', email='benchmark@example.com',
+            first_name='Бенчмарк', last_name='Бенчмарк'
+        )
+        tag = Tag.objects.create(name='Тег', color='#000000', slug='tag')
+        ingredient = Ingredient.objects.create(
+            name='ингредиент', measurement_unit='г'
+        )
+        factory = APIRequestFactory()
+        fields = {
+            'name': 'Рецепт бенчмарка',
+            'text': 'Описание',
+            'cooking_time': 10,
+        }
+        ingredients = [{'id': ingredient.id, 'amount': 10}]
+        report = []
+        for width in widths:
+            content = make_image(width)
+            requests = {
+                'base64': factory.post('/api/recipes/', {
+                    **fields,
+                    'tags': [tag.id],
+                    'ingredients': ingredients,
+                    'image': 'data:image/jpeg;base64,'
+                             + base64.b64encode(content).decode(),
+                }, format='json'),
+                'multipart': factory.post('/api/recipes/', {
+                    **fields,
+                    'tags': [tag.id],
+                    'ingredients[0]id': ingredient.id,
+                    'ingredients[0]amount': 10,
+                    'image': SimpleUploadedFile(
+                        'benchmark.jpg', content, 'image/jpeg'
+                    ),
+                }, format='multipart'),
+            }
+            result = {
+                'width': width,
+                'height': width * 3 // 4,
+                'file_kb': round(len(content) / 1024),
+            }
+            for name, request in requests.items():
+                force_authenticate(request, user)
+                result[name] = measure(request)
+            report.append(result)
+        return report
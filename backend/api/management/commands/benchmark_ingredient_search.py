@@ -0,0 +1,87 @@
+import csv
+import json
+import math
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.ingredients.autocomplete import IngredientIndex, fold
+
+UPDATES = 1000
+
+
+def measure(function, queries):
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        function(query)
+        timings.append((time.perf_counter() - started) * 1_000_000)
+    timings.sort()
+    return {
+        'median_us': round(statistics.median(timings), 2),
+        'p95_us': round(timings[math.ceil(0.95 * len(timings)) - 1], 2),
+        'max_us': round(timings[-1], 2),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Измеряет время автодополнения ингредиентов по индексу в памяти '
+        'на данных из CSV-файла.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--csv',
+            default=str(settings.BASE_DIR.parent / 'data' / 'ingredients.csv'),
+            help='CSV-файл со строками "название,единица измерения".'
+        )
+        parser.add_argument(
+            '--limit', type=int, default=settings.INGREDIENT_SEARCH_LIMIT,
+            help='Максимальное число ингредиентов в ответе.'
+        )
+
+    def handle(self, *args, **options):
+        with open(options['csv'], encoding='utf-8') as file:
+            rows = [(pk, name, unit) for pk, (name, unit)
+                    in enumerate(csv.reader(file), start=1)]
+        started = time.perf_counter()
+        index = IngredientIndex()
+        index.build(rows)
+        build_ms = (time.perf_counter() - started) * 1000
+
+        names = [fold(name) for _, name, _ in rows]
+        queries = sorted(
+            {name[:length] for name in names for length in (1, 2, 3)}
+            | {name[1:4] for name in names if len(name) > 4}
+        )
+        limit = options['limit']
+
+        def scan(query):
+            """Полный перебор, как при istartswith без индекса."""
+            query = fold(query)
+            return [row for row, name in zip(rows, names)
+                    if name.startswith(query)]
+
+        def update(row):
+            """Правка одного ингредиента, как после сохранения в админке."""
+            pk, name, unit = row
+            index.update({pk: {
+                'id': pk, 'name': f'{name} ', 'measurement_unit': unit
+            }})
+
+        report = {
+            'ingredients': len(rows),
+            'queries': len(queries),
+            'limit': limit,
+            'build_ms': round(build_ms, 2),
+            'index': measure(
+                lambda query: index.search(query, limit, refresh=False),
+                queries
+            ),
+            'full_scan': measure(scan, queries),
+            'update': measure(update, rows[:UPDATES]),
+        }
+        self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
@@ -0,0 +1,189 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+
+from api.management.commands.benchmark_api import (
+    create_base_data,
+    seed_recipes,
+)
+from api.utils.filters import RecipeFilter
+from recipes.models import Recipe
+from tags.models import Tag
+
+PAGE_SIZE = 6
+SELECTIVE_TAG_RECIPES = 10
+# Путь фильтрации, параметры запроса, таблица и столбцы индекса
+# по порядку, которым должен пользоваться план. В параметры
+# подставляются значения прогона.
+ACCESS_PATHS = (
+    ('feed', '', 'recipes_recipe', ('pub_date', 'id')),
+    ('author', 'author={author_id}', 'recipes_recipe', ('author_id', )),
+    ('author-tags', 'author={author_id}&tags={tag}',
+     'recipes_recipe', ('author_id', )),
+    ('tags', 'tags={tag}&tags={other_tag}',
+     'recipes_recipe_tags', ('recipe_id', 'tag_id')),
+    ('tags-selective', 'tags={selective_tag}',
+     'recipes_recipe_tags', ('tag_id', 'recipe_id')),
+    ('favorited', 'is_favorited=1',
+     'recipes_favorite', ('user_id', 'recipe_id')),
+    ('in-cart', 'is_in_shopping_cart=1',
+     'recipes_shoppingcart', ('user_id', 'recipe_id')),
+    ('popular', 'ordering=popular', 'recipes_recipe', ('favorites_count', )),
+)
+# SQLite выполняет EXISTS как коррелированный подзапрос для каждого
+# рецепта и не начинает план с таблицы связи.
+POSTGRESQL_ONLY = {'tags-selective'}
+
+
+def table_indexes(cursor, table):
+    """
+    Возвращает индексы таблицы: {имя: [столбцы]}.
+
+    SQLite не сообщает через интроспекцию имена индексов уникальных
+    ограничений (sqlite_autoindex_*), поэтому они читаются из PRAGMA.
+    """
+    if connection.vendor == 'sqlite':
+        cursor.execute(f'PRAGMA index_list({table})')
+        names = [row[1] for row in cursor.fetchall()]
+        indexes = {}
+        for name in names:
+            cursor.execute(f'PRAGMA index_info({name})')
+            indexes[name] = [
+                row[2] for row in sorted(cursor.fetchall())
+            ]
+        return indexes
+    return {
+        name: constraint['columns']
+        for name, constraint in connection.introspection.get_constraints(
+            cursor, table
+        ).items()
+        if constraint['index'] or constraint['unique']
+    }
+
+
+def matching_indexes(table, columns):
+    """Имена индексов таблицы, которые начинаются со столбцов columns."""
+    with connection.cursor() as cursor:
+        indexes = table_indexes(cursor, table)
+    return sorted(
+        name for name, index_columns in indexes.items()
+        if list(index_columns[:len(columns)]) == list(columns)
+    )
+
+
+def filter_queryset(params, user):
+    """Возвращает первую страницу рецептов, отобранных RecipeFilter."""
+    request = RequestFactory().get(f'/api/recipes/?{params}')
+    request.user = user
+    filterset = RecipeFilter(
+        request.GET, queryset=Recipe.objects.all(), request=request
+    )
+    if not filterset.is_valid():
+        raise CommandError(f'{params}: {dict(filterset.errors)}')
+    return filterset.qs[:PAGE_SIZE]
+
+
+def explain(queryset):
+    """
+    Возвращает план запроса.
+
+    В PostgreSQL последовательное чтение запрещается: на небольшой
+    временной БД планировщику дешевле прочитать таблицу целиком,
+    а проверяется, что нужный индекс подходит запросу.
+    """
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+
+def prepare_data(size):
+    """
+    Наполняет БД рецептами и возвращает контекст прогона.
+
+    Редкий тег стоит на нескольких рецептах: по нему план
+    начинается с индекса (tag_id, recipe_id) таблицы связи.
+    """
+    state = create_base_data()
+    seed_recipes(state, size)
+    selective_tag = Tag.objects.create(
+        name='Редкий тег', color='#fedcba', slug='selective'
+    )
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe_id=recipe_id, tag_id=selective_tag.id)
+        for recipe_id in Recipe.objects.order_by('id').values_list(
+            'id', flat=True
+        )[:SELECTIVE_TAG_RECIPES]
+    )
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+    return {
+        'viewer': state['viewer'],
+        'author_id': state['authors'][0].id,
+        'tag': state['tags'][0].slug,
+        'other_tag': state['tags'][1].slug,
+        'selective_tag': selective_tag.slug,
+    }
+
+
+def explain_access_paths(context):
+    """
+    Возвращает по каждому пути фильтрации (имя, использованные
+    подходящие индексы, план). Пути, которые нельзя проверить
+    на текущей БД, пропускаются.
+    """
+    results = []
+    for name, params, table, columns in ACCESS_PATHS:
+        if name in POSTGRESQL_ONLY and connection.vendor != 'postgresql':
+            continue
+        plan = explain(filter_queryset(
+            params.format(**context), context['viewer']
+        ))
+        used = [
+            index for index in matching_indexes(table, columns)
+            if index in plan
+        ]
+        results.append((name, used, plan))
+    return results
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет временную БД рецептами и проверяет по EXPLAIN, '
+        'что каждый путь фильтрации списка рецептов использует индекс.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--size', type=int, default=10000,
+            help='Количество рецептов во временной БД.'
+        )
+        parser.add_argument(
+            '--verbose-plans', action='store_true',
+            help='Выводить планы всех запросов, а не только ошибочных.'
+        )
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        try:
+            results = explain_access_paths(prepare_data(options['size']))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        failed = []
+        for name, used, plan in results:
+            self.stdout.write('{}: {}'.format(
+                name, ', '.join(used) or 'индекс не используется'
+            ))
+            if not used:
+                failed.append(name)
+            if options['verbose_plans'] or not used:
+                self.stdout.write(plan)
+        if failed:
+            raise CommandError(
+                'Индекс не используется: ' + ', '.join(failed)
+            )
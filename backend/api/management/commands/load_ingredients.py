@@ -0,0 +1,66 @@
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.ingredients.autocomplete import ingredient_index
+from api.utils.cache import ingredients_cache
+from ingredients.loader import READERS, load_ingredients
+
+EXTENSIONS = {
+    '.csv': 'csv',
+    '.json': 'json',
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает справочник ингредиентов из CSV, JSON или NDJSON. '
+        'Уже существующие ингредиенты не дублируются, поэтому команду '
+        'можно запускать повторно.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='Файл с ингредиентами, например data/ingredients.csv.'
+        )
+        parser.add_argument(
+            '--format', choices=sorted(READERS),
+            help='Формат файла. По умолчанию определяется по расширению.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько записей обрабатывать за одну транзакцию.'
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        file_format = options['format'] or EXTENSIONS.get(
+            path.suffix.lower()
+        )
+        if file_format is None:
+            raise CommandError(
+                'Не удалось определить формат файла, укажите --format.'
+            )
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть положительным.')
+        started = time.perf_counter()
+        try:
+            with open(path, encoding='utf-8', newline='') as file:
+                stats = load_ingredients(
+                    READERS[file_format](file), options['batch_size']
+                )
+        except (OSError, ValueError) as error:
+            raise CommandError(error)
+        finally:
+            # bulk_create не отправляет post_save, кэш сбрасывается вручную.
+            ingredients_cache.invalidate()
+            ingredient_index.invalidate()
+        self.stdout.write(
+            f'Добавлено: {stats["inserted"]}, '
+            f'уже были: {stats["existing"]}, '
+            f'пропущено: {stats["skipped"]}, '
+            f'время: {time.perf_counter() - started:.2f} с'
+        )
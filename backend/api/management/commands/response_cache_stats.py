@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.utils.cache import recipe_responses
+
+
+class Command(BaseCommand):
+    help = (
+        'Выводит число попаданий и промахов кэша ответов API '
+        'для анонимных пользователей.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset', action='store_true',
+            help='Обнулить счётчики после вывода.'
+        )
+        parser.add_argument(
+            '--invalidate', action='store_true',
+            help='Сбросить все закэшированные ответы.'
+        )
+
+    def handle(self, *args, **options):
+        if not settings.RESPONSE_CACHE_STATS:
+            self.stderr.write(
+                'Счётчики выключены: задайте RESPONSE_CACHE_STATS=True.'
+            )
+        stats = recipe_responses.stats()
+        total = stats['hits'] + stats['misses']
+        ratio = stats['hits'] / total if total else 0
+        self.stdout.write(
+            f'Попаданий: {stats["hits"]}, промахов: {stats["misses"]}, '
+            f'доля попаданий: {ratio:.1%}'
+        )
+        if options['reset']:
+            recipe_responses.reset_stats()
+        if options['invalidate']:
+            recipe_responses.invalidate()
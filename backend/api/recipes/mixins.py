@@ -1,10 +1,118 @@
+import hashlib
+import json
+
+from rest_framework import status
+from rest_framework.exceptions import APIException
 from rest_framework.response import Response
 
+from django.db import transaction
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+from api.utils.cache import ingredients_cache, recipe_responses, tags_cache
+from recipes.models import Recipe
+
+# Признаки текущего пользователя из аннотаций RecipeViewSet.get_queryset.
+VIEWER_FLAGS = ('is_favorited', 'is_in_shopping_cart', 'author_is_subscribed')
+
+
+class PreconditionFailed(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = 'Рецепт изменился, загрузите его заново.'
+    default_code = 'precondition_failed'
+
+
+def recipes_etag(recipes, extra=()):
+    """
+    Строит ETag ответа с рецептами без их сериализации.
+
+    Учитывает время изменения рецептов, признаки текущего пользователя,
+    версии профилей авторов, тегов и ингредиентов.
+    """
+    authors = sorted({recipe.author_id for recipe in recipes})
+    parts = [
+        tags_cache.get_version(),
+        ingredients_cache.get_version(),
+        *recipe_responses.get_versions(
+            [f'profile:{author}' for author in authors]
+        ),
+        *extra,
+    ]
+    for recipe in recipes:
+        parts.append(':'.join((
+            str(recipe.pk), recipe.updated_at.isoformat(),
+            *(str(getattr(recipe, flag, '')) for flag in VIEWER_FLAGS)
+        )))
+    return '"{}"'.format(
+        hashlib.sha1('\n'.join(parts).encode()).hexdigest()
+    )
+
+
+class ConditionalRecipeMixin:
+    """
+    Условные запросы к рецептам.
+
+    Список и рецепт отдаются с ETag и Last-Modified. Если ETag
+    совпадает с If-None-Match, возвращается 304 без сериализации.
+    If-Modified-Since учитывается только для рецепта и только
+    у анонимных пользователей: признаки избранного и списка покупок
+    меняются без изменения updated_at.
+    """
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        return self.conditional_response(
+            request, [instance], instance.updated_at,
+            lambda: Response(self.get_serializer(instance).data),
+            use_last_modified=not request.user.is_authenticated
+        )
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return super().list(request, *args, **kwargs)
+        # Ссылки пагинации и count вычисляются без сериализации рецептов.
+        meta = json.dumps(self.get_paginated_response([]).data)
+        return self.conditional_response(
+            request, page,
+            max((recipe.updated_at for recipe in page), default=None),
+            lambda: self.get_paginated_response(
+                self.get_serializer(page, many=True).data
+            ),
+            extra=[meta]
+        )
+
+    def conditional_response(self, request, recipes, updated_at, view,
+                             extra=(), use_last_modified=False):
+        etag = recipes_etag(recipes, extra)
+        last_modified = updated_at and int(updated_at.timestamp())
+        response = get_conditional_response(
+            request, etag=etag,
+            last_modified=last_modified if use_last_modified else None
+        )
+        if response is None:
+            response = view()
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified)
+        patch_vary_headers(response, ('Authorization', ))
+        return response
+
 
 class PatchModelMixin:
+    """
+    Частичное обновление рецепта.
+
+    Если передан If-Match, а ETag рецепта изменился, возвращается 412.
+    В ответе передаётся новый ETag рецепта.
+    """
     def partial_update(self, request, *args, **kwargs):
         partial = True
         instance = self.get_object()
+        if request.META.get('HTTP_IF_MATCH') and get_conditional_response(
+            request, etag=recipes_etag([instance])
+        ) is not None:
+            raise PreconditionFailed()
         serializer = self.get_serializer(
             instance, data=request.data, partial=partial
         )
@@ -12,7 +120,25 @@ class PatchModelMixin:
         self.perform_update(serializer)
         if getattr(instance, '_prefetched_objects_cache', None):
             instance._prefetched_objects_cache = {}
-        return Response(serializer.data)
+        response = Response(serializer.data)
+        response['ETag'] = recipes_etag([instance])
+        return response
 
     def perform_update(self, serializer):
-        serializer.save()
+        """
+        Сохраняет рецепт.
+
+        Между проверкой If-Match и сохранением рецепт мог изменить
+        другой запрос, поэтому updated_at сверяется ещё раз
+        под блокировкой строки.
+        """
+        if not self.request.META.get('HTTP_IF_MATCH'):
+            serializer.save()
+            return
+        instance = serializer.instance
+        with transaction.atomic():
+            if not Recipe.objects.select_for_update().filter(
+                pk=instance.pk, updated_at=instance.updated_at
+            ).exists():
+                raise PreconditionFailed()
+            serializer.save()
@@ -1,12 +1,22 @@
 from rest_framework import serializers
-from rest_framework.validators import UniqueTogetherValidator
 
+from django.conf import settings
 from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 
 from api.tags.serializers import TagSerialiser
 from api.users.serializers import RecipeSmallSerializer, UserGetSerializer
-from api.utils.utils import Base64ImageField, create_ingredients
-from recipes.models import Favorite, Recipe, RecipeIngredient, ShoppingCart
+from api.utils.utils import (
+    Base64ImageField,
+    ImageDerivativesField,
+    create_ingredients,
+    sync_ingredients,
+)
+from api.utils.viewer import ViewerStateListSerializer, ViewerStateMixin
+from ingredients.models import Ingredient
+from recipes.ingredient_index import recipe_ingredient_index
+from recipes.models import Recipe, RecipeIngredient
+from recipes.shopping_list import change_recipe_in_shopping_lists
 from tags.models import Tag
 
 
@@ -42,7 +52,7 @@ class IngredientPostSerializer(serializers.ModelSerializer):
         fields = ('id', 'amount')
 
 
-class RecipeGetSerializer(serializers.ModelSerializer):
+class RecipeGetSerializer(ViewerStateMixin, serializers.ModelSerializer):
     """Сериализатор для получения информации о рецепте."""
     tags = TagSerialiser(many=True, read_only=True)
     author = UserGetSerializer(read_only=True)
@@ -53,28 +63,37 @@ class RecipeGetSerializer(serializers.ModelSerializer):
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
     image = Base64ImageField(required=False)
+    images = ImageDerivativesField()
 
     class Meta:
         model = Recipe
         fields = (
             'id', 'tags', 'author', 'ingredients',
             'is_favorited', 'is_in_shopping_cart', 'name',
-            'image', 'text', 'cooking_time'
+            'image', 'images', 'text', 'cooking_time'
+        )
+        list_serializer_class = ViewerStateListSerializer
+
+    def prime_viewer_state(self, instances):
+        """
+        Регистрирует рецепты и их авторов.
+
+        Признаки, вычисленные аннотациями queryset'а (см.
+        RecipeViewSet.get_queryset), берутся из них без запросов.
+        """
+        state = self.viewer_state
+        state.prime('favorite', instances, annotation='is_favorited')
+        state.prime('cart', instances, annotation='is_in_shopping_cart')
+        state.prime(
+            'subscription', instances, key='author_id',
+            annotation='author_is_subscribed'
         )
 
     def get_is_favorited(self, obj):
-        request = self.context.get('request')
-        return (request and request.user.is_authenticated
-                and Favorite.objects.filter(
-                    user=request.user, recipe=obj
-                ).exists())
+        return self.viewer_state.has('favorite', obj.pk)
 
     def get_is_in_shopping_cart(self, obj):
-        request = self.context.get('request')
-        return (request and request.user.is_authenticated
-                and ShoppingCart.objects.filter(
-                    user=request.user, recipe=obj
-                ).exists())
+        return self.viewer_state.has('cart', obj.pk)
 
 
 class RecipeCreateSerializer(serializers.ModelSerializer):
@@ -102,11 +121,19 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 'Петрушки в долг не желаете ? :)'
             )
-        for ingredient in ingredients_list:
-            if ingredients_list.count(ingredient) > 1:
-                raise serializers.ValidationError(
-                    'Вы пытаетесь добавить в рецепт два одинаковых ингредиента'
-                )
+        if len(set(ingredients_list)) != len(ingredients_list):
+            raise serializers.ValidationError(
+                'Вы пытаетесь добавить в рецепт два одинаковых ингредиента'
+            )
+        found = Ingredient.objects.in_bulk(ingredients_list)
+        missing = [pk for pk in ingredients_list if pk not in found]
+        if missing:
+            raise serializers.ValidationError(
+                'Ингредиенты не найдены: '
+                + ', '.join(str(pk) for pk in missing)
+            )
+        for ingredient in ingredients:
+            ingredient['ingredient'] = found[ingredient['id']]
         return ingredients
 
     def validate_cooking_time(self, cooking_time):
@@ -131,47 +158,75 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         ingredients = validated_data.pop('recipeingredients')
         tags = validated_data.pop('tags')
         recipe = Recipe.objects.create(author=request.user, **validated_data)
-        recipe.tags.clear()
         recipe.tags.set(tags)
         create_ingredients(ingredients, recipe)
+        recipe_ingredient_index.refresh([recipe.pk])
         return recipe
 
     @transaction.atomic
     def update(self, instance, validated_data):
-        ingredients = validated_data.pop('recipeingredients')
-        tags = validated_data.pop('tags')
-        instance.tags.clear()
-        instance.tags.set(tags)
-        instance.ingredients.clear()
-        super().update(instance, validated_data)
-        create_ingredients(ingredients, instance)
-        instance.save()
-        return instance
+        ingredients = validated_data.pop('recipeingredients', None)
+        tags = validated_data.pop('tags', None)
+        if tags is not None:
+            instance.tags.set(tags)
+        if ingredients is not None:
+            change_recipe_in_shopping_lists(
+                instance.pk, sync_ingredients(ingredients, instance)
+            )
+            recipe_ingredient_index.refresh([instance.pk])
+        return super().update(instance, validated_data)
 
     def to_representation(self, instance):
         request = self.context.get('request')
+        prefetch_related_objects(
+            [instance], 'tags', Prefetch(
+                'recipeingredients',
+                RecipeIngredient.objects.select_related('ingredient')
+            )
+        )
         return RecipeGetSerializer(
             instance,
             context={'request': request}
         ).data
 
 
-class FavoriteSerializer(serializers.ModelSerializer):
-    """Сериализатор для работы с избранными рецептами."""
-    class Meta:
-        model = Favorite
-        fields = '__all__'
-        validators = [
-            UniqueTogetherValidator(
-                queryset=Favorite.objects.all(),
-                fields=('user', 'recipe'),
-                message='Рецепт уже добавлен в избранное'
-            )
-        ]
+class RecipeIdsSerializer(serializers.Serializer):
+    """Сериализатор списка рецептов для массовых операций."""
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BULK_RECIPES_LIMIT,
+    )
 
-    def to_representation(self, instance):
-        request = self.context.get('request')
-        return RecipeSmallSerializer(
-            instance.recipe,
-            context={'request': request}
+
+class IngredientIdsSerializer(serializers.Serializer):
+    """Сериализатор набора ингредиентов для подбора рецептов."""
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.INGREDIENT_MATCH_LIMIT,
+    )
+
+
+class RecipeMatchSerializer(RecipeSmallSerializer):
+    """
+    Сериализатор рецепта, подобранного по набору ингредиентов.
+
+    covered - сколько ингредиентов рецепта есть в наборе,
+    missing - ингредиенты рецепта, которых в наборе нет.
+    """
+    covered = serializers.IntegerField(read_only=True)
+    missing = serializers.SerializerMethodField()
+
+    class Meta(RecipeSmallSerializer.Meta):
+        fields = RecipeSmallSerializer.Meta.fields + ('covered', 'missing')
+
+    def get_missing(self, obj):
+        available = self.context['ingredient_ids']
+        return IngredientGetSerializer(
+            [
+                item for item in obj.recipeingredients.all()
+                if item.ingredient_id not in available
+            ],
+            many=True
         ).data
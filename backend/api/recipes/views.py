@@ -1,25 +1,49 @@
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import mixins, permissions, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
-from django.db.models import Sum
-from django.shortcuts import HttpResponse, get_object_or_404
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Prefetch, Sum
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
 
-from .mixins import PatchModelMixin
+from .mixins import ConditionalRecipeMixin, PatchModelMixin
+from api.jobs.serializers import JobSerializer
 from api.recipes.serializers import (
-    FavoriteSerializer,
+    IngredientIdsSerializer,
     RecipeCreateSerializer,
     RecipeGetSerializer,
+    RecipeIdsSerializer,
+    RecipeMatchSerializer,
 )
-from api.shoppingcart.serializers import ShoppingCartSerializer
+from api.shoppingcart.export import (
+    SHOPPING_LIST_RENDERERS,
+    export_shopping_list,
+)
+from api.shoppingcart.serializers import ShoppingListExportSerializer
+from api.users.serializers import RecipeSmallSerializer
+from api.utils.cache import AnonymousResponseCacheMixin
 from api.utils.filters import RecipeFilter
+from api.utils.pagination import RecipeCursorPagination
 from api.utils.permissions import IsAdminAuthorOrReadOnly
-from recipes.models import Recipe, RecipeIngredient
+from api.utils.uploads import RecipeImageUploadHandler
+from jobs.queue import enqueue
+from recipes.bulk import add_user_recipes, remove_user_recipes
+from recipes.ingredient_index import recipe_ingredient_index
+from recipes.models import Favorite, Recipe, RecipeIngredient, ShoppingCart
+from tags.models import Tag
+from users.models import Subscription
+
+# Параметры, которые меняют порядок рецептов.
+CURSOR_CONFLICTS = ('ordering', 'search')
 
 
-class RecipeViewSet(mixins.CreateModelMixin,
+class RecipeViewSet(AnonymousResponseCacheMixin,
+                    ConditionalRecipeMixin,
+                    mixins.CreateModelMixin,
                     mixins.ListModelMixin,
                     mixins.RetrieveModelMixin,
                     PatchModelMixin,
@@ -30,65 +54,149 @@ class RecipeViewSet(mixins.CreateModelMixin,
     permission_classes = (IsAdminAuthorOrReadOnly, )
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    lookup_value_regex = r'\d+'
+
+    def initialize_request(self, request, *args, **kwargs):
+        request.upload_handlers = [RecipeImageUploadHandler(request)]
+        return super().initialize_request(request, *args, **kwargs)
+
+    @property
+    def paginator(self):
+        """
+        Возвращает пагинатор.
+
+        По умолчанию используется постраничная пагинация page/limit,
+        а при наличии параметра cursor - keyset-пагинация. Курсор
+        построен по дате публикации, поэтому с другим порядком
+        (ordering, ранжирование search, рекомендации) он не сочетается.
+        """
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params
+            if RecipeCursorPagination.cursor_query_param in params:
+                if self.action != 'list' or any(
+                    params.get(param) for param in CURSOR_CONFLICTS
+                ):
+                    raise ValidationError({
+                        RecipeCursorPagination.cursor_query_param: (
+                            'Курсор работает только с сортировкой '
+                            'по дате публикации, без ordering и search.'
+                        )
+                    })
+                self._paginator = RecipeCursorPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def get_queryset(self):
+        """
+        Возвращает queryset рецептов.
+
+        Автор, теги и ингредиенты загружаются заранее, чтобы число
+        запросов не зависело от размера страницы. Для авторизованного
+        пользователя признаки is_favorited, is_in_shopping_cart
+        и подписки на автора вычисляются подзапросами в основном запросе.
+        """
+        queryset = super().get_queryset().select_related(
+            'author'
+        ).prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.all()),
+            Prefetch(
+                'recipeingredients',
+                queryset=RecipeIngredient.objects.select_related(
+                    'ingredient'
+                )
+            ),
+        )
+        user = self.request.user
+        if user.is_authenticated:
+            queryset = queryset.annotate(
+                author_is_subscribed=Exists(Subscription.objects.filter(
+                    user=user, author=OuterRef('author')
+                )),
+                is_favorited=Exists(Favorite.objects.filter(
+                    user=user, recipe=OuterRef('pk')
+                )),
+                is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                    user=user, recipe=OuterRef('pk')
+                )),
+            )
+        return queryset
 
     def get_serializer_class(self):
         """Возвращает класс сериализатора в зависимости от действия."""
-        if self.action in ('list', 'retrieve'):
+        if self.action in ('list', 'retrieve', 'recommended'):
             return RecipeGetSerializer
         return RecipeCreateSerializer
 
-    def _action_delete(self, pk, serializer_class):
+    def _action_delete(self, pk, model):
         """
         Метод для удаления.
 
         Общий метод для удаления объекта
         из коллекции (избранное/список покупок).
+        Повторное удаление не считается ошибкой.
         """
-        user = self.request.user
-        recipe = get_object_or_404(Recipe, pk=pk)
-        object = serializer_class.Meta.model.objects.filter(
-            user=user,
-            recipe=recipe
-        )
-        if not object.exists():
-            return Response(
-                {'error': 'У вас нет этого рецепта где-либо :).'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        object.delete()
+        if not remove_user_recipes(model, self.request.user.id, [pk]):
+            get_object_or_404(Recipe, pk=pk)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
-    def _action_post(self, pk, serializer_class):
+    def _action_post(self, pk, model):
         """
         Метод для добавления.
 
         Общий метод для добавления объекта
         в коллекцию (избранное/список покупок).
+        Возвращает 201, если рецепт добавлен, и 200,
+        если он уже был в коллекции.
         """
-        user = self.request.user
-        serializer = serializer_class(
-            data={'user': user.id, 'recipe': pk},
-            context={'request': self.request}
-        )
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
+        recipe = get_object_or_404(Recipe, pk=pk)
+        added = add_user_recipes(model, self.request.user.id, [recipe.pk])
         return Response(
-            serializer.data,
-            status=status.HTTP_201_CREATED
+            RecipeSmallSerializer(
+                recipe, context={'request': self.request}
+            ).data,
+            status=status.HTTP_201_CREATED if added else status.HTTP_200_OK
         )
 
+    def _action_bulk(self, model, change):
+        """
+        Метод для массового добавления/удаления.
+
+        Принимает {"recipes": [id, ...]} и возвращает id рецептов,
+        которые действительно были добавлены или удалены.
+        """
+        serializer = RecipeIdsSerializer(data=self.request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response({'recipes': change(
+            model, self.request.user.id,
+            serializer.validated_data['recipes']
+        )})
+
     @action(
         methods=['POST'], detail=True,
         permission_classes=[permissions.IsAuthenticated]
     )
     def favorite(self, request, pk=None):
         """Добавляет рецепт в избранное."""
-        return self._action_post(pk, FavoriteSerializer)
+        return self._action_post(pk, Favorite)
 
     @favorite.mapping.delete
     def favorite_delete(self, request, pk=None):
         """Удаляет рецепт из избранного."""
-        return self._action_delete(pk, FavoriteSerializer)
+        return self._action_delete(pk, Favorite)
+
+    @action(
+        methods=['POST'], detail=False, url_path='favorite',
+        permission_classes=[permissions.IsAuthenticated]
+    )
+    def favorite_bulk(self, request):
+        """Добавляет несколько рецептов в избранное."""
+        return self._action_bulk(Favorite, add_user_recipes)
+
+    @favorite_bulk.mapping.delete
+    def favorite_bulk_delete(self, request):
+        """Удаляет несколько рецептов из избранного."""
+        return self._action_bulk(Favorite, remove_user_recipes)
 
     @action(
         methods=['POST'], detail=True,
@@ -96,39 +204,153 @@ class RecipeViewSet(mixins.CreateModelMixin,
     )
     def shopping_cart(self, request, pk=None):
         """Добавляет рецепт в список покупок."""
-        return self._action_post(pk, ShoppingCartSerializer)
+        return self._action_post(pk, ShoppingCart)
 
     @shopping_cart.mapping.delete
     def shopping_cart_delete(self, request, pk=None):
         """Удаляет рецепт из списка покупок."""
-        return self._action_delete(pk, ShoppingCartSerializer)
+        return self._action_delete(pk, ShoppingCart)
+
+    @action(
+        methods=['POST'], detail=False, url_path='shopping_cart',
+        permission_classes=[permissions.IsAuthenticated]
+    )
+    def shopping_cart_bulk(self, request):
+        """Добавляет несколько рецептов в список покупок."""
+        return self._action_bulk(ShoppingCart, add_user_recipes)
+
+    @shopping_cart_bulk.mapping.delete
+    def shopping_cart_bulk_delete(self, request):
+        """Удаляет несколько рецептов из списка покупок."""
+        return self._action_bulk(ShoppingCart, remove_user_recipes)
 
     @action(
         detail=False,
         methods=['get'],
-        permission_classes=[IsAuthenticated, ]
+        permission_classes=[IsAuthenticated, ],
+        renderer_classes=SHOPPING_LIST_RENDERERS
     )
     def download_shopping_cart(self, request):
-        """Скачивает список покупок в виде текстового файла."""
-        def create_shopping_list(ingredients):
-            shopping_list = ['Список покупок:\n']
-            for ingredient in ingredients:
-                name = ingredient['ingredient__name']
-                unit = ingredient['ingredient__measurement_unit']
-                amount = ingredient['ingredient_amount']
-                shopping_list.append(f'\n{name} - {amount}, {unit}')
-            return shopping_list
-
-        ingredients = RecipeIngredient.objects.filter(
-            recipe__carts__user=request.user
-        ).values(
-            'ingredient__name', 'ingredient__measurement_unit'
-        ).annotate(ingredient_amount=Sum('amount'))
-
-        shopping_list = create_shopping_list(ingredients)
-
-        response = HttpResponse(shopping_list, content_type='text/plain')
+        """
+        Скачивает список покупок.
+
+        Формат выбирается параметром format (txt, csv, json, pdf)
+        или заголовком Accept, по умолчанию - текстовый файл.
+        Файл формируется потоком по мере чтения строк из БД.
+        """
+        renderer = request.accepted_renderer
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type += f'; charset={renderer.charset}'
+        response = StreamingHttpResponse(
+            export_shopping_list(request.user, renderer.format),
+            content_type=content_type
+        )
         response[
             'Content-Disposition'
-        ] = 'attachment; filename="shopping_cart.txt"'
+        ] = f'attachment; filename="shopping_cart.{renderer.format}"'
         return response
+
+    @action(
+        detail=False,
+        methods=['post'],
+        permission_classes=[IsAuthenticated, ],
+    )
+    def export_shopping_cart(self, request):
+        """
+        Ставит в очередь выгрузку списка покупок в файл.
+
+        Формат передаётся в поле format (txt, csv, json, pdf).
+        Ссылка на файл появится в результате задачи /api/jobs/{id}/.
+        """
+        serializer = ShoppingListExportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        file_format = serializer.validated_data['format']
+        job = enqueue(
+            'api.export_shopping_list',
+            {'user_id': request.user.id, 'file_format': file_format},
+            dedup_key=f'shopping-list:{request.user.id}:{file_format}',
+            user=request.user
+        )
+        return Response(
+            JobSerializer(job, context={'request': request}).data,
+            status=status.HTTP_202_ACCEPTED
+        )
+
+    @action(detail=False, methods=['get'])
+    def by_ingredients(self, request):
+        """
+        Подбирает рецепты по набору ингредиентов.
+
+        Ингредиенты передаются повторяющимся параметром ingredients.
+        Рецепты ранжируются по инвертированному индексу в памяти,
+        из БД загружается только текущая страница.
+        """
+        serializer = IngredientIdsSerializer(
+            data={'ingredients': request.query_params.getlist('ingredients')}
+        )
+        serializer.is_valid(raise_exception=True)
+        ingredient_ids = set(serializer.validated_data['ingredients'])
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(
+            recipe_ingredient_index.search(ingredient_ids), request, self
+        )
+        recipes = Recipe.objects.prefetch_related(Prefetch(
+            'recipeingredients',
+            queryset=RecipeIngredient.objects.select_related('ingredient')
+        )).in_bulk([pk for pk, _ in page])
+        results = []
+        for pk, covered in page:
+            if pk in recipes:
+                recipes[pk].covered = covered
+                results.append(recipes[pk])
+        return paginator.get_paginated_response(RecipeMatchSerializer(
+            results, many=True,
+            context={'request': request, 'ingredient_ids': ingredient_ids}
+        ).data)
+
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk):
+        """
+        Возвращает похожие рецепты.
+
+        Читает готовую таблицу, которую пересчитывает
+        команда build_recommendations.
+        """
+        recipes = list(Recipe.objects.filter(
+            similar_to__recipe_id=pk
+        ).order_by(
+            '-similar_to__score', '-id'
+        )[:settings.SIMILAR_RECIPES_LIMIT])
+        if not recipes:
+            get_object_or_404(Recipe, pk=pk)
+        return Response(RecipeSmallSerializer(
+            recipes, many=True, context={'request': request}
+        ).data)
+
+    @action(
+        detail=False, methods=['get'],
+        permission_classes=[IsAuthenticated, ]
+    )
+    def recommended(self, request):
+        """
+        Возвращает рекомендации пользователю.
+
+        Рецепты, похожие на его избранное, ранжируются по сумме
+        близостей. Избранные и собственные рецепты пропускаются.
+        Работают те же фильтры, что и у списка рецептов.
+        """
+        user = request.user
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            similar_to__recipe__favorites__user=user
+        ).exclude(
+            favorites__user=user
+        ).exclude(
+            author=user
+        ).annotate(
+            recommendation_score=Sum('similar_to__score')
+        ).order_by('-recommendation_score', '-id')
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(
+            self.get_serializer(page, many=True).data
+        )
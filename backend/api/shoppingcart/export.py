@@ -0,0 +1,181 @@
+import csv
+import json
+import os
+import uuid
+from functools import lru_cache
+from io import BytesIO
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from rest_framework import renderers
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import Sum
+
+from recipes.models import ShoppingListItem
+
+TITLE = 'Список покупок'
+CSV_HEADER = ('Ингредиент', 'Единица измерения', 'Количество')
+ITERATOR_CHUNK_SIZE = 500
+PDF_FONT_NAME = 'ShoppingListFont'
+PDF_FONT_SIZE = 12
+PDF_TITLE_SIZE = 16
+PDF_MARGIN = 50
+PDF_LINE_HEIGHT = 18
+EXPORTS_DIR = 'exports/shopping_lists'
+
+
+class ShoppingListRenderer(renderers.BaseRenderer):
+    """
+    Рендерер для выбора формата выгрузки.
+
+    Сам список покупок отдаётся потоком в обход рендерера,
+    через него проходят только ответы с ошибками.
+    """
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+
+class TextRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+
+class CSVRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class PDFRenderer(ShoppingListRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+
+
+SHOPPING_LIST_RENDERERS = (
+    TextRenderer, CSVRenderer, renderers.JSONRenderer, PDFRenderer
+)
+
+
+def get_shopping_list(user):
+    """
+    Возвращает итератор по суммарным количествам ингредиентов.
+
+    Количества берутся из заранее посчитанного ShoppingListItem,
+    строки читаются из БД порциями и не собираются в память целиком.
+    """
+    return ShoppingListItem.objects.filter(
+        user=user
+    ).values_list(
+        'ingredient__name', 'ingredient__measurement_unit'
+    ).annotate(
+        ingredient_amount=Sum('amount')
+    ).order_by('ingredient__name').iterator(chunk_size=ITERATOR_CHUNK_SIZE)
+
+
+def export_txt(rows):
+    yield f'{TITLE}:\n'
+    for name, unit, amount in rows:
+        yield f'\n{name} - {amount}, {unit}'
+
+
+class Echo:
+    """Псевдобуфер: csv.writer возвращает строку вместо записи в файл."""
+    def write(self, value):
+        return value
+
+
+def export_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def export_json(rows):
+    yield '['
+    separator = ''
+    for name, unit, amount in rows:
+        yield separator + json.dumps(
+            {'name': name, 'measurement_unit': unit, 'amount': amount},
+            ensure_ascii=False
+        )
+        separator = ','
+    yield ']'
+
+
+@lru_cache(maxsize=None)
+def get_pdf_font():
+    """
+    Регистрирует шрифт с кириллицей один раз на процесс.
+
+    Разбор TTF-файла - самая дорогая часть подготовки PDF.
+    """
+    pdfmetrics.registerFont(
+        TTFont(PDF_FONT_NAME, settings.SHOPPING_LIST_FONT)
+    )
+    return PDF_FONT_NAME
+
+
+def export_pdf(rows):
+    font = get_pdf_font()
+    width, height = A4
+    buffer = BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4, pageCompression=1)
+    pdf.setTitle(TITLE)
+    pdf.setFont(font, PDF_TITLE_SIZE)
+    pdf.drawString(PDF_MARGIN, height - PDF_MARGIN, TITLE)
+    pdf.setFont(font, PDF_FONT_SIZE)
+    position = height - PDF_MARGIN - 2 * PDF_LINE_HEIGHT
+    for name, unit, amount in rows:
+        if position < PDF_MARGIN:
+            pdf.showPage()
+            pdf.setFont(font, PDF_FONT_SIZE)
+            position = height - PDF_MARGIN
+        pdf.drawString(PDF_MARGIN, position, f'• {name} ({unit}) — {amount}')
+        position -= PDF_LINE_HEIGHT
+    pdf.save()
+    yield buffer.getvalue()
+
+
+EXPORTERS = {
+    'txt': export_txt,
+    'csv': export_csv,
+    'json': export_json,
+    'pdf': export_pdf,
+}
+
+
+def export_shopping_list(user, file_format):
+    """Возвращает генератор частей файла списка покупок."""
+    return EXPORTERS[file_format](get_shopping_list(user))
+
+
+def save_shopping_list(user_id, file_format):
+    """
+    Сохраняет файл списка покупок в хранилище и возвращает его URL.
+
+    Имя файла содержит случайную часть, чтобы чужой список нельзя
+    было угадать. Предыдущие выгрузки пользователя удаляются.
+    """
+    directory = f'{EXPORTS_DIR}/{user_id}'
+    if default_storage.exists(directory):
+        for name in default_storage.listdir(directory)[1]:
+            default_storage.delete(os.path.join(directory, name))
+    content = b''.join(
+        part if isinstance(part, bytes) else part.encode('utf-8')
+        for part in export_shopping_list(user_id, file_format)
+    )
+    name = default_storage.save(
+        f'{directory}/{uuid.uuid4().hex}.{file_format}',
+        ContentFile(content)
+    )
+    return default_storage.url(name)
@@ -1,26 +1,8 @@
 from rest_framework import serializers
-from rest_framework.validators import UniqueTogetherValidator
 
-from api.users.serializers import RecipeSmallSerializer
-from recipes.models import ShoppingCart
+from api.shoppingcart.export import EXPORTERS
 
 
-class ShoppingCartSerializer(serializers.ModelSerializer):
-    """Сериализатор для работы со списком покупок."""
-    class Meta:
-        model = ShoppingCart
-        fields = '__all__'
-        validators = [
-            UniqueTogetherValidator(
-                queryset=ShoppingCart.objects.all(),
-                fields=('user', 'recipe'),
-                message='Рецепт уже добавлен в список покупок'
-            )
-        ]
-
-    def to_representation(self, instance):
-        request = self.context.get('request')
-        return RecipeSmallSerializer(
-            instance.recipe,
-            context={'request': request}
-        ).data
+class ShoppingListExportSerializer(serializers.Serializer):
+    """Сериализатор параметров выгрузки списка покупок в файл."""
+    format = serializers.ChoiceField(choices=tuple(EXPORTERS), default='txt')
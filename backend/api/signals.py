@@ -0,0 +1,128 @@
+from import_export.signals import post_import
+from rest_framework.authtoken.models import Token, TokenProxy
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from api.ingredients.autocomplete import ingredient_index
+from api.utils.authentication import invalidate_tokens, user_token_keys
+from api.utils.cache import ingredients_cache, recipe_responses, tags_cache
+from ingredients.models import Ingredient
+from recipes.models import Recipe
+from recipes.shopping_list import recipe_ingredients_changed
+from tags.models import Tag
+from users.models import User
+
+# Поля пользователя, которых нет в ответах API.
+USER_SERVICE_FIELDS = {
+    'last_login', 'password', 'recipes_count', 'followers_count'
+}
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tags_cache(**kwargs):
+    transaction.on_commit(tags_cache.invalidate)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def refresh_ingredient_catalog(instance, **kwargs):
+    """
+    Кэш справочника и индекс автодополнения меняются после коммита:
+    при откате в них не остаются ингредиенты, которых нет в БД.
+    """
+    ingredient_index.refresh([instance.pk])
+    transaction.on_commit(ingredients_cache.invalidate)
+
+
+@receiver(post_import)
+def invalidate_imported_catalog(model, **kwargs):
+    """
+    Сбрасывает кэш после импорта через админку.
+
+    Сброс до коммита позволил бы другому процессу закэшировать
+    старые строки под новой версией.
+    """
+    if model is Ingredient:
+        transaction.on_commit(ingredients_cache.invalidate)
+        transaction.on_commit(ingredient_index.invalidate)
+    elif model is Tag:
+        transaction.on_commit(tags_cache.invalidate)
+
+
+def bump_recipe_responses(author_id):
+    """
+    Сбрасывает кэш ответов с рецептами автора после коммита.
+
+    До коммита изменения не видны другим запросам, и они могли бы
+    снова закэшировать старые данные под новой версией. Теги
+    и ингредиенты рецепта меняются вместе с сохранением рецепта,
+    поэтому m2m_changed не слушается: это отключило бы быстрое
+    добавление тегов в Recipe.tags.set().
+    """
+    transaction.on_commit(
+        lambda: recipe_responses.bump('all', f'author:{author_id}')
+    )
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def invalidate_recipe_responses(instance, **kwargs):
+    bump_recipe_responses(instance.author_id)
+
+
+@receiver(recipe_ingredients_changed)
+def invalidate_recipe_ingredient_responses(recipe_ids, **kwargs):
+    """Ингредиенты изменены в админке, в обход сохранения рецепта."""
+    for author_id in set(Recipe.objects.filter(
+        pk__in=recipe_ids
+    ).values_list('author_id', flat=True)):
+        bump_recipe_responses(author_id)
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_responses(instance, created, update_fields, **kwargs):
+    """
+    Профиль автора выводится в рецептах и входит в их ETag.
+
+    У нового пользователя ещё нет рецептов в закэшированных ответах.
+    """
+    if created or (
+        update_fields and set(update_fields) <= USER_SERVICE_FIELDS
+    ):
+        return
+    bump_recipe_responses(instance.pk)
+    transaction.on_commit(
+        lambda: recipe_responses.bump(f'profile:{instance.pk}')
+    )
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_token_cache(instance, update_fields, **kwargs):
+    """
+    Пользователь в кэше токенов устаревает при смене пароля,
+    деактивации и любой правке профиля, в том числе в админке.
+    """
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    transaction.on_commit(
+        lambda: invalidate_tokens(user_token_keys(instance.pk))
+    )
+
+
+@receiver(post_delete, sender=Token)
+@receiver(post_delete, sender=TokenProxy)
+def invalidate_token_cache(instance, **kwargs):
+    """
+    Токен удалён: выход (auth/token/logout), админка (удаляет
+    через TokenProxy), QuerySet.delete() или каскадное удаление
+    пользователя.
+
+    Из-за обработчика Django удаляет токены не одним DELETE, а сначала
+    выбирает их, зато отозванный токен сразу перестаёт действовать.
+    """
+    # После удаления Django обнуляет первичный ключ, то есть сам токен.
+    key = instance.key
+    transaction.on_commit(lambda: invalidate_tokens([key]))
@@ -2,11 +2,13 @@ from rest_framework import viewsets
 from rest_framework.permissions import AllowAny
 
 from .serializers import TagSerialiser
+from api.utils.cache import CachedCatalogMixin, tags_cache
 from tags.models import Tag
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(CachedCatalogMixin, viewsets.ReadOnlyModelViewSet):
     """Отображение инфо о теге."""
+    catalog_cache = tags_cache
     queryset = Tag.objects.all()
     serializer_class = TagSerialiser
     permission_classes = (AllowAny, )
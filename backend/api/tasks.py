@@ -0,0 +1,7 @@
+from api.shoppingcart.export import save_shopping_list
+from jobs.queue import task
+
+
+@task('api.export_shopping_list', max_attempts=2)
+def export_shopping_list_task(user_id, file_format):
+    return {'url': save_shopping_list(user_id, file_format)}
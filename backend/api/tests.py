@@ -0,0 +1,848 @@
+import random
+from unittest import skipUnless
+from uuid import uuid4
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from api.ingredients.autocomplete import OVERLAY_LIMIT, IngredientIndex
+from api.ingredients.autocomplete import change_log as ingredient_change_log
+from api.management.commands.explain_recipe_filters import (
+    ACCESS_PATHS,
+    explain_access_paths,
+    prepare_data,
+)
+from api.recipes.serializers import RecipeCreateSerializer
+from api.utils.cache import recipe_responses
+from api.utils.utils import sync_ingredients
+from api.utils.viewer import ViewerState
+from foodgram.changelog import version_cache
+from ingredients.models import Ingredient
+from recipes.images import DeduplicatedFileSystemStorage
+from recipes.ingredient_index import RecipeIngredientIndex, change_log
+from recipes.models import (
+    Favorite,
+    Recipe,
+    RecipeIngredient,
+    RecipeIngredientChange,
+    ShoppingCart,
+    ShoppingListItem,
+)
+from recipes.shopping_list import (
+    rebuild_shopping_lists,
+    track_recipe_ingredients,
+    verify_shopping_lists,
+)
+from recipes.tasks import mark_derivatives_ready
+from tags.models import Tag
+from users.models import Subscription, User
+
+RECIPES_AMOUNT = 30
+
+
+def create_user(username):
+    return User.objects.create(
+        username=username, email=f'{username}@example.com',
+        first_name='Имя', last_name='Фамилия'
+    )
+
+
+def create_recipe(author, ingredients=(), name='Рецепт'):
+    """Создаёт рецепт с ингредиентами [(ингредиент, количество)]."""
+    recipe = Recipe.objects.create(
+        author=author, name=name, text='Описание',
+        image='recipes/test.png', cooking_time=1
+    )
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=amount)
+        for ingredient, amount in ingredients
+    )
+    return recipe
+
+
+class RecipeListQueriesTest(TestCase):
+    """Число запросов списка рецептов не зависит от размера страницы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = User.objects.create_user(
+            username='viewer', email='viewer@example.com',
+            first_name='Зритель', last_name='Тестов', password='Pass-12345'
+        )
+        authors = [
+            User.objects.create(
+                username=f'author{index}', email=f'author{index}@example.com',
+                first_name='Автор', last_name=str(index)
+            )
+            for index in range(3)
+        ]
+        tags = [
+            Tag.objects.create(
+                name=f'Тег {index}', color=f'#00000{index}',
+                slug=f'tag{index}'
+            )
+            for index in range(2)
+        ]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f'ингредиент {index}', measurement_unit='г'
+            )
+            for index in range(3)
+        ]
+        Recipe.objects.bulk_create(
+            Recipe(
+                author=authors[index % len(authors)],
+                name=f'Рецепт {index}',
+                text='Описание',
+                image='recipes/test.png',
+                cooking_time=index + 1,
+            )
+            for index in range(RECIPES_AMOUNT)
+        )
+        recipes = list(Recipe.objects.order_by('id'))
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe_id=recipe.pk, tag_id=tag.pk)
+            for recipe in recipes
+            for tag in tags
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=1)
+            for recipe in recipes
+            for ingredient in ingredients
+        )
+        for model in (Favorite, ShoppingCart):
+            model.objects.bulk_create(
+                model(user=cls.viewer, recipe=recipe)
+                for recipe in recipes[::2]
+            )
+
+    def setUp(self):
+        recipe_responses.invalidate()
+        self.client = APIClient()
+
+    def count_queries(self, limit):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/recipes/', {'limit': limit})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), limit)
+        return len(queries)
+
+    def test_anonymous_list(self):
+        self.assertEqual(self.count_queries(2), self.count_queries(20))
+
+    def test_authenticated_list(self):
+        self.client.force_authenticate(self.viewer)
+        self.assertEqual(self.count_queries(2), self.count_queries(20))
+
+
+class CursorPaginationTest(TestCase):
+    """Курсор листает ленту и не сочетается с другим порядком."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = create_user('reader')
+        author = create_user('novelist')
+        cls.recipes = [
+            create_recipe(author, name=f'Рецепт {index}')
+            for index in range(7)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+
+    def test_walks_feed(self):
+        response = self.client.get('/api/recipes/', {'cursor': '', 'limit': 3})
+        seen = []
+        while True:
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            seen.extend(recipe['id'] for recipe in data['results'])
+            if not data['next']:
+                break
+            response = self.client.get(data['next'])
+        self.assertEqual(
+            seen, list(Recipe.objects.values_list('pk', flat=True))
+        )
+
+    def test_rejects_other_orderings(self):
+        for path, params in (
+            ('/api/recipes/', {'ordering': 'popular'}),
+            ('/api/recipes/', {'search': 'рецепт'}),
+            ('/api/recipes/recommended/', {}),
+        ):
+            with self.subTest(path=path, params=params):
+                response = self.client.get(path, {**params, 'cursor': ''})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('cursor', response.json())
+
+
+class CounterFieldsTest(TestCase):
+    """Полный save() не перезаписывает счётчики, которые ведёт F()."""
+
+    def test_stale_recipe_keeps_counters(self):
+        author = User.objects.create(
+            username='author', email='author@example.com',
+            first_name='Автор', last_name='Тестов'
+        )
+        reader = User.objects.create(
+            username='reader', email='reader@example.com',
+            first_name='Читатель', last_name='Тестов'
+        )
+        recipe = Recipe.objects.create(
+            author=author, name='Рецепт', text='Описание',
+            image='recipes/test.png', cooking_time=1
+        )
+        stale = Recipe.objects.get(pk=recipe.pk)
+        Favorite.objects.create(user=reader, recipe=recipe)
+        ShoppingCart.objects.create(user=reader, recipe=recipe)
+        stale.name = 'Новое имя'
+        stale.save()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.name, 'Новое имя')
+        self.assertEqual(
+            (recipe.favorites_count, recipe.carts_count), (1, 1)
+        )
+        author.refresh_from_db()
+        self.assertEqual(author.recipes_count, 1)
+
+
+class CachedTokenAuthenticationTest(TestCase):
+    """Кэш токенов сбрасывается при выходе и деактивации."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='cached', email='cached@example.com',
+            first_name='Кэш', last_name='Тестов', password='Pass-12345'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 200)
+
+    def test_logout_revokes_cached_token(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/auth/token/logout/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 401)
+
+    def test_deactivation_revokes_cached_token(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            user = User.objects.get(pk=self.user.pk)
+            user.is_active = False
+            user.save()
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 401)
+
+    def test_cached_user_keeps_counters(self):
+        Recipe.objects.create(
+            author=self.user, name='Рецепт', text='Описание',
+            image='recipes/test.png', cooking_time=1
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/users/set_password/', {
+                'current_password': 'Pass-12345',
+                'new_password': 'Other-Pass-54321',
+            })
+        self.assertEqual(response.status_code, 204)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.recipes_count, 1)
+        self.assertTrue(self.user.check_password('Other-Pass-54321'))
+
+
+class IngredientIndexTest(TestCase):
+    """Автодополнение ингредиентов после точечных изменений."""
+
+    QUERIES = ('', 'а', 'ка', 'сол', 'ец', 'мука', 'новый', 'ь')
+
+    def test_updates_match_rebuild(self):
+        names = ('мука', 'соль', 'сахар', 'перец', 'картофель', 'капуста')
+        rows = {
+            pk: {
+                'id': pk, 'name': f'{names[pk % len(names)]} {pk}',
+                'measurement_unit': 'г'
+            }
+            for pk in range(1, 200)
+        }
+        index = IngredientIndex()
+        index.build(
+            (pk, item['name'], item['measurement_unit'])
+            for pk, item in rows.items()
+        )
+        generator = random.Random(0)
+        for step in range(OVERLAY_LIMIT * 3):
+            pk = generator.randint(1, 250)
+            item = None
+            if generator.random() < 0.7:
+                item = {
+                    'id': pk, 'name': f'новый {generator.choice(names)}',
+                    'measurement_unit': 'кг'
+                }
+                rows[pk] = item
+            else:
+                rows.pop(pk, None)
+            index.update({pk: item})
+            rebuilt = IngredientIndex()
+            rebuilt.build(
+                (pk, item['name'], item['measurement_unit'])
+                for pk, item in rows.items()
+            )
+            for query in self.QUERIES:
+                with self.subTest(step=step, query=query):
+                    self.assertEqual(
+                        index.search(query, 20, refresh=False),
+                        rebuilt.search(query, 20, refresh=False)
+                    )
+
+    def test_other_process_applies_changes(self):
+        ingredient_change_log.invalidate()
+        reader = IngredientIndex()
+        self.assertEqual(reader.search('новый', 10), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            ingredient = Ingredient.objects.create(
+                name='Новый продукт', measurement_unit='г'
+            )
+        self.assertEqual(
+            [item['id'] for item in reader.search('новый', 10)],
+            [ingredient.pk]
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            ingredient.delete()
+        self.assertEqual(reader.search('новый', 10), [])
+
+
+class ViewerStateQueriesTest(TestCase):
+    """Признаки текущего пользователя загружаются пакетом на страницу."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = create_user('follower')
+        cls.authors = [create_user(f'followed{index}') for index in range(12)]
+        for author in cls.authors:
+            create_recipe(author)
+            create_recipe(author)
+            Subscription.objects.create(user=cls.viewer, author=author)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+
+    def count_queries(self, path, limit):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path, {'limit': limit})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual(len(results), limit)
+        return len(queries), results
+
+    def test_users_list(self):
+        few, _ = self.count_queries('/api/users/', 2)
+        many, results = self.count_queries('/api/users/', 10)
+        self.assertEqual(few, many)
+        self.assertEqual(
+            {user['id']: user['is_subscribed'] for user in results},
+            {
+                user.pk: user != self.viewer
+                for user in User.objects.filter(
+                    pk__in=[user['id'] for user in results]
+                )
+            }
+        )
+
+    def test_subscriptions(self):
+        path = '/api/users/subscriptions/'
+        few, _ = self.count_queries(path, 2)
+        many, results = self.count_queries(path, 10)
+        self.assertEqual(few, many)
+        self.assertTrue(all(user['is_subscribed'] for user in results))
+
+    def test_primed_objects_load_together(self):
+        recipes = list(Recipe.objects.all())
+        Favorite.objects.create(user=self.viewer, recipe=recipes[0])
+        state = ViewerState(self.viewer)
+        state.prime('favorite', recipes)
+        with self.assertNumQueries(1):
+            flags = [state.has('favorite', recipe.pk) for recipe in recipes]
+        self.assertEqual(flags, [True] + [False] * (len(recipes) - 1))
+
+
+class ResponseCacheInvalidationTest(TestCase):
+    """Ответы анонимам из кэша обновляются после правок."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('publisher')
+        cls.tag = Tag.objects.create(
+            name='Завтрак', color='#ffaa00', slug='breakfast'
+        )
+        cls.recipe = create_recipe(cls.author)
+        cls.recipe.tags.add(cls.tag)
+
+    def setUp(self):
+        recipe_responses.invalidate()
+        self.client = APIClient()
+        self.assertEqual(self.first_recipe()['name'], 'Рецепт')
+
+    def first_recipe(self):
+        response = self.client.get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results'][0]
+
+    def detail(self):
+        response = self.client.get(f'/api/recipes/{self.recipe.pk}/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_cached_list_skips_database(self):
+        with self.assertNumQueries(0):
+            self.first_recipe()
+
+    def test_recipe_edit(self):
+        self.detail()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.name = 'Новое имя'
+            self.recipe.save()
+        self.assertEqual(self.first_recipe()['name'], 'Новое имя')
+        self.assertEqual(self.detail()['name'], 'Новое имя')
+
+    def test_author_edit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.first_name = 'Новое'
+            self.author.save()
+        self.assertEqual(self.first_recipe()['author']['first_name'], 'Новое')
+
+    def test_tag_edit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tag.name = 'Ужин'
+            self.tag.save()
+        self.assertEqual(self.first_recipe()['tags'][0]['name'], 'Ужин')
+
+    def test_ingredients_changed_in_admin(self):
+        self.detail()
+        ingredient = Ingredient.objects.create(
+            name='яйцо', measurement_unit='шт'
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            with track_recipe_ingredients([self.recipe.pk]):
+                RecipeIngredient.objects.create(
+                    recipe=self.recipe, ingredient=ingredient, amount=2
+                )
+        self.assertEqual(
+            [item['name'] for item in self.detail()['ingredients']],
+            ['яйцо']
+        )
+
+    def test_stats_disabled_by_default(self):
+        recipe_responses.reset_stats()
+        self.first_recipe()
+        self.assertEqual(recipe_responses.stats(), {'hits': 0, 'misses': 0})
+
+    @override_settings(RESPONSE_CACHE_STATS=True)
+    def test_stats_enabled(self):
+        recipe_responses.reset_stats()
+        self.addCleanup(recipe_responses.reset_stats)
+        self.first_recipe()
+        self.detail()
+        self.assertEqual(recipe_responses.stats(), {'hits': 1, 'misses': 1})
+
+
+class ConditionalRequestTest(TestCase):
+    """ETag рецептов: 304 на If-None-Match и 412 на устаревший If-Match."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('editor')
+        cls.recipe = create_recipe(cls.author)
+
+    def setUp(self):
+        recipe_responses.invalidate()
+        self.client = APIClient()
+        self.path = f'/api/recipes/{self.recipe.pk}/'
+
+    def test_not_modified(self):
+        for user in (None, self.author):
+            with self.subTest(user=user):
+                self.client.force_authenticate(user)
+                for path in (self.path, '/api/recipes/'):
+                    etag = self.client.get(path)['ETag']
+                    response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+                    self.assertEqual(response.status_code, 304)
+
+    def test_viewer_flags_change_etag(self):
+        self.client.force_authenticate(self.author)
+        etag = self.client.get(self.path)['ETag']
+        self.client.post(f'{self.path}favorite/')
+        response = self.client.get(self.path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['is_favorited'])
+
+    def test_stale_if_match(self):
+        self.client.force_authenticate(self.author)
+        etag = self.client.get(self.path)['ETag']
+        response = self.client.patch(
+            self.path, {'name': 'Первая правка'}, format='json',
+            HTTP_IF_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(self.client.get(self.path)['ETag'], response['ETag'])
+        response = self.client.patch(
+            self.path, {'name': 'Вторая правка'}, format='json',
+            HTTP_IF_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 412)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.name, 'Первая правка')
+
+
+class ImageDerivativesTest(TestCase):
+    """Ссылки на копии картинки появляются, когда копии готовы."""
+
+    def test_original_until_ready(self):
+        recipe = create_recipe(create_user('photographer'))
+        recipe_responses.invalidate()
+        client = APIClient()
+        path = f'/api/recipes/{recipe.pk}/'
+        images = client.get(path).json()['images']
+        self.assertEqual(
+            {url for formats in images.values() for url in formats.values()},
+            {'http://testserver/media/recipes/test.png'}
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            mark_derivatives_ready(recipe.image.name)
+        images = client.get(path).json()['images']
+        self.assertEqual(
+            images['thumbnail']['webp'],
+            'http://testserver/media/recipes/test-thumbnail.webp'
+        )
+
+    def test_deduplication_only_for_recipe_images(self):
+        self.assertIsInstance(
+            Recipe._meta.get_field('image').storage,
+            DeduplicatedFileSystemStorage
+        )
+        self.assertNotIsInstance(
+            default_storage, DeduplicatedFileSystemStorage
+        )
+
+
+class ShoppingListTest(TestCase):
+    """Список покупок следует за корзиной и ингредиентами рецептов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('buyer')
+        cls.author = create_user('chef')
+        cls.flour, cls.salt, cls.sugar = (
+            Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ('мука', 'соль', 'сахар')
+        )
+        cls.first = create_recipe(
+            cls.author, [(cls.flour, 100), (cls.salt, 5)]
+        )
+        cls.second = create_recipe(cls.author, [(cls.flour, 50)])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def items(self):
+        return dict(ShoppingListItem.objects.filter(
+            user=self.user
+        ).values_list('ingredient_id', 'amount'))
+
+    def test_cart_changes(self):
+        for recipe in (self.first, self.second):
+            response = self.client.post(
+                f'/api/recipes/{recipe.pk}/shopping_cart/'
+            )
+            self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            self.items(), {self.flour.pk: 150, self.salt.pk: 5}
+        )
+        response = self.client.delete(
+            f'/api/recipes/{self.first.pk}/shopping_cart/'
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.items(), {self.flour.pk: 50})
+        self.assertEqual(verify_shopping_lists(), [])
+
+    def test_recipe_ingredient_changes(self):
+        ShoppingCart.objects.create(user=self.user, recipe=self.first)
+        author = APIClient()
+        author.force_authenticate(self.author)
+        response = author.patch(
+            f'/api/recipes/{self.first.pk}/',
+            {'ingredients': [
+                {'id': self.flour.pk, 'amount': 200},
+                {'id': self.sugar.pk, 'amount': 10},
+            ]},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            self.items(), {self.flour.pk: 200, self.sugar.pk: 10}
+        )
+        self.assertEqual(verify_shopping_lists(), [])
+
+    def test_verify_and_rebuild(self):
+        for recipe in (self.first, self.second):
+            ShoppingCart.objects.create(user=self.user, recipe=recipe)
+        items = ShoppingListItem.objects.filter(user=self.user)
+        items.filter(ingredient=self.salt).update(amount=1)
+        items.filter(ingredient=self.flour).delete()
+        self.assertCountEqual(verify_shopping_lists([self.user.pk]), [
+            (self.user.pk, self.flour.pk, 150, None),
+            (self.user.pk, self.salt.pk, 5, 1),
+        ])
+        self.assertEqual(rebuild_shopping_lists([self.user.pk]), 2)
+        self.assertEqual(verify_shopping_lists(), [])
+        self.assertEqual(
+            self.items(), {self.flour.pk: 150, self.salt.pk: 5}
+        )
+
+
+class CollectionMutationTest(TestCase):
+    """Добавление в избранное и корзину идемпотентно."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('collector')
+        author = create_user('writer')
+        cls.recipes = [
+            create_recipe(author, name=f'Рецепт {index}')
+            for index in range(3)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def counters(self):
+        return list(Recipe.objects.order_by('pk').values_list(
+            'favorites_count', 'carts_count'
+        ))
+
+    def test_single_add_and_remove(self):
+        recipe = self.recipes[0]
+        for url in ('favorite', 'shopping_cart'):
+            with self.subTest(url):
+                path = f'/api/recipes/{recipe.pk}/{url}/'
+                self.assertEqual(self.client.post(path).status_code, 201)
+                self.assertEqual(self.client.post(path).status_code, 200)
+                self.assertEqual(self.client.delete(path).status_code, 204)
+                self.assertEqual(self.client.delete(path).status_code, 204)
+        self.assertEqual(self.counters(), [(0, 0)] * 3)
+        missing = Recipe.objects.order_by('pk').last().pk + 1
+        self.assertEqual(
+            self.client.post(f'/api/recipes/{missing}/favorite/').status_code,
+            404
+        )
+        self.assertEqual(
+            self.client.delete(
+                f'/api/recipes/{missing}/favorite/'
+            ).status_code,
+            404
+        )
+
+    def test_bulk_add_and_remove(self):
+        first, second, third = (recipe.pk for recipe in self.recipes)
+        missing = third + 1
+        for url, model in (('favorite', Favorite),
+                           ('shopping_cart', ShoppingCart)):
+            with self.subTest(url):
+                path = f'/api/recipes/{url}/'
+                self.client.post(f'/api/recipes/{first}/{url}/')
+                response = self.client.post(
+                    path, {'recipes': [first, second, missing]},
+                    format='json'
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json(), {'recipes': [second]})
+                response = self.client.post(
+                    path, {'recipes': [first, second]}, format='json'
+                )
+                self.assertEqual(response.json(), {'recipes': []})
+                response = self.client.delete(
+                    path, {'recipes': [second, third]}, format='json'
+                )
+                self.assertEqual(response.json(), {'recipes': [second]})
+                self.assertEqual(
+                    list(model.objects.filter(
+                        user=self.user
+                    ).values_list('recipe_id', flat=True)),
+                    [first]
+                )
+        self.assertEqual(self.counters(), [(1, 1), (0, 0), (0, 0)])
+
+
+class RecipeIngredientSyncTest(TestCase):
+    """Ингредиенты рецепта проверяются пакетом и меняются по разнице."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.flour, cls.salt, cls.sugar, cls.pepper = (
+            Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ('мука', 'соль', 'сахар', 'перец')
+        )
+        cls.recipe = create_recipe(create_user('baker'), [
+            (cls.flour, 100), (cls.salt, 5), (cls.sugar, 10)
+        ])
+
+    def rows(self):
+        return {
+            row.ingredient_id: (row.pk, row.amount)
+            for row in self.recipe.recipeingredients.all()
+        }
+
+    def test_validation_reads_ingredients_once(self):
+        ingredients = [
+            {'id': ingredient.pk, 'amount': 1}
+            for ingredient in (self.flour, self.salt, self.sugar)
+        ]
+        with self.assertNumQueries(1):
+            validated = RecipeCreateSerializer().validate_ingredients(
+                ingredients
+            )
+        self.assertEqual(
+            [ingredient['ingredient'] for ingredient in validated],
+            [self.flour, self.salt, self.sugar]
+        )
+
+    def test_unknown_ingredients_are_listed(self):
+        missing = self.pepper.pk + 1
+        serializer = RecipeCreateSerializer(data={'ingredients': [
+            {'id': self.flour.pk, 'amount': 1}, {'id': missing, 'amount': 1}
+        ]})
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual(
+            serializer.errors['ingredients'],
+            [f'Ингредиенты не найдены: {missing}']
+        )
+
+    def test_only_changed_rows_are_written(self):
+        before = self.rows()
+        deltas = sync_ingredients([
+            {'ingredient': self.flour, 'amount': 100},
+            {'ingredient': self.salt, 'amount': 7},
+            {'ingredient': self.pepper, 'amount': 1},
+        ], self.recipe)
+        self.assertEqual(deltas, {
+            self.salt.pk: 2, self.sugar.pk: -10, self.pepper.pk: 1
+        })
+        after = self.rows()
+        self.assertEqual(after[self.flour.pk], before[self.flour.pk])
+        self.assertEqual(
+            after[self.salt.pk], (before[self.salt.pk][0], 7)
+        )
+        self.assertNotIn(self.sugar.pk, after)
+        self.assertEqual(after[self.pepper.pk][1], 1)
+
+    def test_unchanged_list_writes_nothing(self):
+        with self.assertNumQueries(1):
+            deltas = sync_ingredients([
+                {'ingredient': self.flour, 'amount': 100},
+                {'ingredient': self.salt, 'amount': 5},
+                {'ingredient': self.sugar, 'amount': 10},
+            ], self.recipe)
+        self.assertEqual(deltas, {})
+
+
+class RecipeIngredientIndexTest(TestCase):
+    """Индекс поиска по ингредиентам догоняет журнал изменений."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create(
+            username='cook', email='cook@example.com',
+            first_name='Повар', last_name='Тестов'
+        )
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'продукт {index}', measurement_unit='г'
+            )
+            for index in range(2)
+        ]
+        cls.recipe = Recipe.objects.create(
+            author=author, name='Рецепт', text='Описание',
+            image='recipes/test.png', cooking_time=1
+        )
+        RecipeIngredient.objects.create(
+            recipe=cls.recipe, ingredient=cls.ingredients[0], amount=1
+        )
+
+    def setUp(self):
+        change_log.invalidate()
+        self.reader = RecipeIngredientIndex()
+        self.writer = RecipeIngredientIndex()
+        self.reader.ensure_fresh()
+        self.writer.ensure_fresh()
+
+    def found(self, index, ingredient):
+        return [pk for pk, _ in index.search([ingredient.pk])[:10]]
+
+    def add_ingredient(self):
+        RecipeIngredient.objects.create(
+            recipe=self.recipe, ingredient=self.ingredients[1], amount=1
+        )
+
+    def log(self, pk, recipe_ids):
+        """Запись журнала с заданным номером, как от другого процесса."""
+        RecipeIngredientChange.objects.create(pk=pk, object_ids=recipe_ids)
+        version_cache.set(change_log.hint_key, uuid4().hex, None)
+
+    def test_reader_applies_logged_changes(self):
+        self.add_ingredient()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.writer.refresh([self.recipe.pk])
+        self.assertEqual(
+            self.found(self.writer, self.ingredients[1]), [self.recipe.pk]
+        )
+        with self.assertNumQueries(2):
+            self.reader.ensure_fresh()
+        self.assertEqual(
+            self.found(self.reader, self.ingredients[1]), [self.recipe.pk]
+        )
+        with self.assertNumQueries(0):
+            self.reader.ensure_fresh()
+
+    def test_late_entry_is_applied(self):
+        sequence = self.reader.position.sequence
+        self.log(sequence + 2, [])
+        self.reader.ensure_fresh()
+        self.add_ingredient()
+        self.log(sequence + 1, [self.recipe.pk])
+        self.assertEqual(
+            self.found(self.reader, self.ingredients[1]), [self.recipe.pk]
+        )
+
+    def test_far_behind_rebuilds(self):
+        self.add_ingredient()
+        self.log(self.reader.position.sequence + 5000, [])
+        self.assertEqual(
+            self.found(self.reader, self.ingredients[1]), [self.recipe.pk]
+        )
+
+    def test_deleted_ingredient_leaves_recipes(self):
+        ingredient_id = self.ingredients[0].pk
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ingredients[0].delete()
+        self.assertEqual(list(self.reader.search([ingredient_id])), [])
+
+
+@skipUnless(
+    connection.vendor == 'postgresql', 'Планы проверяются в PostgreSQL'
+)
+class RecipeFilterIndexTest(TestCase):
+    """Каждый путь фильтрации списка рецептов использует свой индекс."""
+
+    def test_access_paths_use_indexes(self):
+        results = explain_access_paths(prepare_data(2000))
+        self.assertEqual(len(results), len(ACCESS_PATHS))
+        for name, used, plan in results:
+            with self.subTest(name):
+                self.assertTrue(used, plan)
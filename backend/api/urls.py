@@ -3,6 +3,7 @@ from rest_framework.routers import DefaultRouter
 from django.urls import include, path
 
 from api.ingredients.views import IngredientViewSet
+from api.jobs.views import JobViewSet
 from api.recipes.views import RecipeViewSet
 from api.tags.views import TagViewSet
 from api.users.views import UserSubscribeView, UserSubscriptionsViewSet
@@ -12,6 +13,7 @@ v1_router = DefaultRouter()
 v1_router.register(r'tags', TagViewSet, basename='tags')
 v1_router.register(r'ingredients', IngredientViewSet, basename='ingredients')
 v1_router.register(r'recipes', RecipeViewSet, basename='recipes')
+v1_router.register(r'jobs', JobViewSet, basename='jobs')
 
 
 urlpatterns = [
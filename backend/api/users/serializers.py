@@ -2,15 +2,38 @@ from djoser.serializers import UserCreateSerializer, UserSerializer
 from rest_framework import serializers
 from rest_framework.validators import UniqueTogetherValidator
 
+from django.conf import settings
+
+from api.utils.utils import ImageDerivativesField
+from api.utils.viewer import ViewerStateListSerializer, ViewerStateMixin
 from recipes.models import Recipe
 from users.models import Subscription, User
 
 
 class RecipeSmallSerializer(serializers.ModelSerializer):
     """Сериализатор для работы с краткой информацией о рецепте."""
+    images = ImageDerivativesField()
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'images', 'cooking_time')
+
+
+def get_recipes_limit(request):
+    """
+    Возвращает количество рецептов автора в списке подписок.
+
+    Параметр recipes_limit проверяется и ограничивается сверху
+    SUBSCRIPTION_RECIPES_LIMIT, по умолчанию отдаётся максимум.
+    """
+    value = request.query_params.get('recipes_limit')
+    if value in (None, ''):
+        return settings.SUBSCRIPTION_RECIPES_LIMIT
+    try:
+        value = serializers.IntegerField(min_value=0).run_validation(value)
+    except serializers.ValidationError as error:
+        raise serializers.ValidationError({'recipes_limit': error.detail})
+    return min(value, settings.SUBSCRIPTION_RECIPES_LIMIT)
 
 
 class UserSignUpSerializer(UserCreateSerializer):
@@ -29,7 +52,7 @@ class UserSignUpSerializer(UserCreateSerializer):
         return value
 
 
-class UserGetSerializer(UserSerializer):
+class UserGetSerializer(ViewerStateMixin, UserSerializer):
     """Сериализатор для работы с информацией о пользователях."""
     is_subscribed = serializers.SerializerMethodField()
 
@@ -40,17 +63,16 @@ class UserGetSerializer(UserSerializer):
             'last_name', 'is_subscribed'
         )
         read_only_fields = 'is_subscribed',
+        list_serializer_class = ViewerStateListSerializer
 
-    def get_is_subscribed(self, obj):
-        request = self.context.get('request')
-        return (
-            request.user.is_authenticated
-            and Subscription.objects.filter(
-                user=request.user,
-                author=obj
-            ).exists()
+    def prime_viewer_state(self, instances):
+        self.viewer_state.prime(
+            'subscription', instances, annotation='is_subscribed'
         )
 
+    def get_is_subscribed(self, obj):
+        return self.viewer_state.has('subscription', obj.pk)
+
 
 class UserSubscribeRepresentSerializer(UserGetSerializer):
     """"Сериализатор для предоставления информации
@@ -58,7 +80,7 @@ class UserSubscribeRepresentSerializer(UserGetSerializer):
     """
     is_subscribed = serializers.SerializerMethodField()
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
+    recipes_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = User
@@ -66,24 +88,19 @@ class UserSubscribeRepresentSerializer(UserGetSerializer):
             'email', 'id', 'username', 'first_name',
             'last_name', 'is_subscribed', 'recipes', 'recipes_count'
         )
+        list_serializer_class = ViewerStateListSerializer
 
     def get_recipes(self, obj):
         request = self.context.get('request')
-        recipes_limit = request.GET.get('recipes_limit')
-
-        recipes = (
-            obj.recipes.all()[:int(recipes_limit)]
-            if recipes_limit
-            else obj.recipes.all()
-        )
+        if hasattr(obj, 'latest_recipes'):
+            recipes = obj.latest_recipes
+        else:
+            recipes = obj.recipes.all()[:get_recipes_limit(request)]
         return RecipeSmallSerializer(
             recipes, many=True,
             context={'request': request}
         ).data
 
-    def get_recipes_count(self, obj):
-        return obj.recipes.count()
-
 
 class UserSubscribeSerializer(serializers.ModelSerializer):
     """Сериализатор для подписки/отписки от пользователей."""
@@ -108,6 +125,8 @@ class UserSubscribeSerializer(serializers.ModelSerializer):
 
     def to_representation(self, instance):
         request = self.context.get('request')
+        # Подписка только что создана, проверять её в БД не нужно.
+        instance.author.is_subscribed = True
         return UserSubscribeRepresentSerializer(
             instance.author, context={'request': request}
         ).data
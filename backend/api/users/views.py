@@ -2,12 +2,17 @@ from rest_framework import mixins, status, viewsets
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from django.db import connection
+from django.db.models import BooleanField, F, Value, Window
+from django.db.models.functions import RowNumber
 from django.shortcuts import get_object_or_404
 
 from api.users.serializers import (
     UserSubscribeRepresentSerializer,
     UserSubscribeSerializer,
+    get_recipes_limit,
 )
+from recipes.models import Recipe
 from users.models import Subscription, User
 
 
@@ -29,18 +34,15 @@ class UserSubscribeView(APIView):
     def delete(self, request, user_id):
         """Метод, выполняющий отписку пользователя от автора."""
         author = get_object_or_404(User, id=user_id)
-        if not Subscription.objects.filter(
+        deleted, _ = Subscription.objects.filter(
             user=request.user,
             author=author
-        ).exists():
+        ).delete()
+        if not deleted:
             return Response(
                 {'errors': 'Вы не подписаны на этого пользователя'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        Subscription.objects.get(
-            user=request.user.id,
-            author=user_id
-        ).delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -52,4 +54,48 @@ class UserSubscriptionsViewSet(
     serializer_class = UserSubscribeRepresentSerializer
 
     def get_queryset(self):
-        return User.objects.filter(following__user=self.request.user)
+        return User.objects.filter(
+            following__user=self.request.user
+        ).annotate(
+            is_subscribed=Value(True, output_field=BooleanField()),
+        ).order_by('username')
+
+    def list(self, request, *args, **kwargs):
+        recipes_limit = get_recipes_limit(request)
+        page = self.paginate_queryset(self.get_queryset())
+        self.attach_latest_recipes(page, recipes_limit)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    def attach_latest_recipes(self, authors, limit):
+        """
+        Загружает последние рецепты всех авторов страницы одним запросом.
+
+        Рецепты нумеруются ROW_NUMBER() OVER (PARTITION BY author),
+        отбор по номеру делается во внешнем запросе: Django 3.2
+        не умеет фильтровать по оконным функциям.
+        """
+        latest_recipes = {author.pk: [] for author in authors}
+        if limit and latest_recipes:
+            sql, params = Recipe.objects.filter(
+                author_id__in=latest_recipes
+            ).only(
+                'id', 'name', 'image', 'derivatives_image', 'cooking_time',
+                'author_id'
+            ).annotate(
+                position=Window(
+                    RowNumber(),
+                    partition_by=F('author_id'),
+                    order_by=(F('pub_date').desc(), F('id').desc()),
+                )
+            ).order_by().query.sql_with_params()
+            quote = connection.ops.quote_name
+            for recipe in Recipe.objects.raw(
+                f'SELECT * FROM ({sql}) ranked '
+                f'WHERE {quote("position")} <= %s '
+                f'ORDER BY {quote("author_id")}, {quote("position")}',
+                (*params, limit)
+            ):
+                latest_recipes[recipe.author_id].append(recipe)
+        for author in authors:
+            author.latest_recipes = latest_recipes[author.pk]
@@ -0,0 +1,46 @@
+import hashlib
+
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def token_cache_key(key):
+    """Ключ записи в кэше: сам токен в кэше не хранится."""
+    return 'auth-token:{}'.format(hashlib.sha256(key.encode()).hexdigest())
+
+
+def invalidate_tokens(keys):
+    """Удаляет из кэша записи токенов keys."""
+    cache.delete_many([token_cache_key(key) for key in keys])
+
+
+def user_token_keys(user_id):
+    """Возвращает токены пользователя."""
+    return list(
+        Token.objects.filter(user_id=user_id).values_list('key', flat=True)
+    )
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Аутентификация по токену с кэшем токен -> пользователь.
+
+    Токен с пользователем хранится в общем кэше Django
+    AUTH_TOKEN_CACHE_TIMEOUT секунд, БД читается только при промахе.
+    Запись удаляется при удалении токена (выход, админка,
+    QuerySet.delete()), смене пароля и любом сохранении пользователя,
+    в том числе при деактивации и правке в админке (см. api.signals).
+    Неактивные пользователи в кэш не попадают. Счётчики из
+    закэшированного пользователя не записываются его save()
+    (см. foodgram.models.CounterFieldsMixin).
+    """
+    def authenticate_credentials(self, key):
+        cache_key = token_cache_key(key)
+        token = cache.get(cache_key)
+        if token is None:
+            user, token = super().authenticate_credentials(key)
+            cache.set(cache_key, token, settings.AUTH_TOKEN_CACHE_TIMEOUT)
+        return token.user, token
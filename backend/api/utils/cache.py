@@ -0,0 +1,285 @@
+import hashlib
+from uuid import uuid4
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.connection import ConnectionProxy
+from django.utils.http import parse_etags
+
+# Версии и счётчики хранятся в кэше, который не вытесняет ключи.
+version_cache = ConnectionProxy(caches, 'versions')
+
+
+class VersionedCache:
+    """
+    Кэш заранее сериализованных ответов в памяти процесса.
+
+    Номер версии хранится в общем кэше Django version_cache, поэтому сброс кэша
+    в одном процессе виден всем воркерам: устаревшие записи
+    перестраиваются при первом обращении после смены версии.
+    """
+    def __init__(self, name):
+        self.version_key = f'{name}:version'
+        self._entries = {}
+
+    def get_version(self):
+        """Возвращает текущую версию, создавая её при необходимости."""
+        version = version_cache.get(self.version_key)
+        if version is None:
+            version_cache.add(self.version_key, uuid4().hex, None)
+            version = version_cache.get(self.version_key)
+        return version
+
+    def invalidate(self):
+        """Сбрасывает кэш во всех процессах и возвращает новую версию."""
+        version = uuid4().hex
+        version_cache.set(self.version_key, version, None)
+        self._entries.clear()
+        return version
+
+    def get_or_build(self, key, build):
+        """
+        Возвращает содержимое и ETag записи.
+
+        build вызывается только если записи нет или её версия устарела.
+        """
+        version = self.get_version()
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != version:
+            content = build()
+            etag = '"{}"'.format(hashlib.sha1(content).hexdigest())
+            entry = (version, content, etag)
+            self._entries[key] = entry
+        return entry[1], entry[2]
+
+
+tags_cache = VersionedCache('tags')
+ingredients_cache = VersionedCache('ingredients')
+
+
+class CachedCatalogMixin:
+    """
+    Отдаёт список и отдельные записи справочника из VersionedCache.
+
+    Ответы содержат строгий ETag, на совпадающий If-None-Match
+    возвращается 304 Not Modified. Запросы с параметрами фильтрации
+    обрабатываются как обычно.
+    """
+    catalog_cache = None
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params:
+            return super().list(request, *args, **kwargs)
+        return self.get_cached_response(
+            request, 'list', lambda: super(CachedCatalogMixin, self).list(
+                request, *args, **kwargs
+            )
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        return self.get_cached_response(
+            request, f'detail:{lookup}',
+            lambda: super(CachedCatalogMixin, self).retrieve(
+                request, *args, **kwargs
+            )
+        )
+
+    def get_cached_response(self, request, key, view):
+        if request.accepted_renderer.format != 'json':
+            return view()
+        content, etag = self.catalog_cache.get_or_build(
+            key, lambda: JSONRenderer().render(view().data)
+        )
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(content, content_type='application/json')
+        response['ETag'] = etag
+        return response
+
+
+class ResponseCache:
+    """
+    Кэш готовых ответов API в бэкенде кэша Django с алиасом alias.
+
+    Счётчики версий и метрики хранятся в version_cache. Ключ записи
+    включает версии областей, от которых зависит ответ: после смены
+    версии старые записи перестают читаться и вытесняются по таймауту.
+    Область epoch входит в ключ любой записи. Попадания и промахи
+    считаются только при включённой настройке RESPONSE_CACHE_STATS.
+    """
+    def __init__(self, name, alias='responses'):
+        self.name = name
+        self.alias = alias
+
+    def _key(self, suffix):
+        return f'{self.name}:{suffix}'
+
+    def get_versions(self, scopes):
+        """Возвращает версии областей, создавая недостающие."""
+        keys = [self._key(f'version:{scope}') for scope in scopes]
+        versions = version_cache.get_many(keys)
+        for key in keys:
+            if key not in versions:
+                version_cache.add(key, uuid4().hex, None)
+                versions[key] = version_cache.get(key)
+        return [versions[key] for key in keys]
+
+    def bump(self, *scopes):
+        """Меняет версии областей, сбрасывая зависящие от них записи."""
+        version_cache.set_many(
+            {self._key(f'version:{scope}'): uuid4().hex for scope in scopes},
+            None
+        )
+
+    def invalidate(self):
+        """Сбрасывает все записи."""
+        self.bump('epoch')
+
+    def make_key(self, parts, scopes):
+        versions = self.get_versions(('epoch', *scopes))
+        digest = hashlib.sha1(
+            '\n'.join((*versions, *parts)).encode()
+        ).hexdigest()
+        return self._key(f'response:{digest}')
+
+    def get(self, key):
+        content = caches[self.alias].get(key)
+        self._count('misses' if content is None else 'hits')
+        return content
+
+    def set(self, key, content):
+        caches[self.alias].set(key, content)
+
+    def _count(self, metric):
+        if not settings.RESPONSE_CACHE_STATS:
+            return
+        key = self._key(f'metrics:{metric}')
+        if not version_cache.add(key, 1, None):
+            try:
+                version_cache.incr(key)
+            except ValueError:
+                version_cache.add(key, 1, None)
+
+    def stats(self):
+        """Возвращает число попаданий и промахов."""
+        metrics = ('hits', 'misses')
+        values = version_cache.get_many(
+            [self._key(f'metrics:{metric}') for metric in metrics]
+        )
+        return {
+            metric: values.get(self._key(f'metrics:{metric}'), 0)
+            for metric in metrics
+        }
+
+    def reset_stats(self):
+        version_cache.delete_many(
+            [self._key(f'metrics:{metric}') for metric in ('hits', 'misses')]
+        )
+
+
+recipe_responses = ResponseCache('recipes')
+# Заголовки ответа, которые хранятся в кэше вместе с телом.
+CACHED_HEADERS = ('ETag', 'Last-Modified', 'Vary')
+
+
+class AnonymousResponseCacheMixin:
+    """
+    Отдаёт список и отдельные рецепты анонимным пользователям из кэша.
+
+    Список кэшируется только с параметрами page, limit, tags и author,
+    ключ строится по их нормализованным значениям. Список рецептов
+    одного автора зависит от версии этого автора, остальные ответы -
+    от общей версии рецептов; в ключ входят также версии тегов
+    и ингредиентов. Версии меняются в api.signals.
+    """
+    response_cache = recipe_responses
+    response_cache_params = ('page', 'limit', 'tags', 'author')
+
+    def list(self, request, *args, **kwargs):
+        return self.get_anonymous_response(
+            request, self.get_list_cache_key(request),
+            lambda: super(AnonymousResponseCacheMixin, self).list(
+                request, *args, **kwargs
+            )
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        return self.get_anonymous_response(
+            request, self.make_cache_key(request, ['detail', lookup], 'all'),
+            lambda: super(AnonymousResponseCacheMixin, self).retrieve(
+                request, *args, **kwargs
+            )
+        )
+
+    def get_list_cache_key(self, request):
+        params = request.query_params
+        if set(params) - set(self.response_cache_params):
+            return None
+        author = params.get('author', '')
+        return self.make_cache_key(
+            request,
+            [
+                'list',
+                params.get('page') or '1',
+                params.get('limit') or str(api_settings.PAGE_SIZE),
+                ','.join(sorted(set(params.getlist('tags')))),
+                author,
+            ],
+            f'author:{author}' if author.isdigit() else 'all'
+        )
+
+    def make_cache_key(self, request, parts, scope):
+        if (request.user.is_authenticated
+                or request.accepted_renderer.format != 'json'):
+            return None
+        return self.response_cache.make_key(
+            [
+                # Ссылки в ответе абсолютные и зависят от адреса сайта.
+                request.build_absolute_uri('/'),
+                tags_cache.get_version(),
+                ingredients_cache.get_version(),
+                *map(str, parts),
+            ],
+            [scope]
+        )
+
+    def get_anonymous_response(self, request, key, view):
+        """
+        Отдаёт ответ из кэша вместе с его ETag и Last-Modified.
+
+        На совпадающий If-None-Match возвращается 304.
+        """
+        if key is None:
+            return view()
+        entry = self.response_cache.get(key)
+        if entry is None:
+            response = view()
+            if response.status_code != 200:
+                return response
+            entry = (
+                JSONRenderer().render(response.data),
+                {header: response[header] for header in CACHED_HEADERS
+                 if response.has_header(header)}
+            )
+            self.response_cache.set(key, entry)
+            cache_status = 'MISS'
+        else:
+            cache_status = 'HIT'
+        content, headers = entry
+        if headers.get('ETag') in parse_etags(
+            request.META.get('HTTP_IF_NONE_MATCH', '')
+        ):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(content, content_type='application/json')
+        for header, value in headers.items():
+            response[header] = value
+        response['X-Cache'] = cache_status
+        return response
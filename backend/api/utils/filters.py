@@ -1,23 +1,48 @@
 from django_filters.rest_framework import FilterSet, filters
 
+from django.db.models import Case, Exists, IntegerField, OuterRef, Value, When
+from django.db.models.functions import Lower
+
 from ingredients.models import Ingredient
-from recipes.models import Recipe
+from recipes.models import Favorite, Recipe, ShoppingCart
+from recipes.search import search_recipes
 from tags.models import Tag
 
 
 class IngredientFilter(FilterSet):
-    name = filters.CharFilter(lookup_expr='istartswith')
+    name = filters.CharFilter(method='get_name')
 
     class Meta:
         model = Ingredient
         fields = ('name', )
 
+    def get_name(self, queryset, name, value):
+        """
+        Поиск по названию в БД.
+
+        Сначала идут совпадения по началу названия, затем по подстроке.
+        Используется, если индекс в памяти отключён.
+        """
+        value = value.lower()
+        return queryset.annotate(
+            lower_name=Lower('name')
+        ).filter(
+            lower_name__contains=value
+        ).annotate(
+            is_substring=Case(
+                When(lower_name__startswith=value, then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField(),
+            )
+        ).order_by('is_substring', 'lower_name')
+
 
 class RecipeFilter(FilterSet):
     tags = filters.ModelMultipleChoiceFilter(
         queryset=Tag.objects.all(),
         field_name='tags__slug',
         to_field_name='slug',
+        method='get_tags',
     )
     is_favorited = filters.BooleanFilter(
         method='get_is_favorited'
@@ -25,17 +50,64 @@ class RecipeFilter(FilterSet):
     is_in_shopping_cart = filters.BooleanFilter(
         method='get_is_in_shopping_cart'
     )
+    search = filters.CharFilter(method='get_search')
+    updated_after = filters.IsoDateTimeFilter(
+        field_name='updated_at', lookup_expr='gt'
+    )
+    ordering = filters.ChoiceFilter(
+        choices=(('popular', 'Сначала популярные'), ),
+        method='get_ordering'
+    )
 
     class Meta:
         model = Recipe
-        fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart')
+        fields = (
+            'author', 'tags', 'is_favorited', 'is_in_shopping_cart',
+            'search', 'ordering', 'updated_after'
+        )
 
-    def get_is_favorited(self, queryset, name, value):
+    def get_tags(self, queryset, name, value):
+        """
+        Рецепты хотя бы с одним из тегов.
+
+        Фильтр - полусоединение EXISTS по таблице связи, а не JOIN:
+        рецепт с несколькими подходящими тегами не дублируется
+        и DISTINCT не нужен.
+        """
+        if not value:
+            return queryset
+        return queryset.filter(Exists(Recipe.tags.through.objects.filter(
+            recipe_id=OuterRef('pk'), tag_id__in=[tag.id for tag in value]
+        )))
+
+    def filter_user_collection(self, queryset, model, value):
+        """Рецепты из коллекции пользователя (EXISTS по user, recipe)."""
         if self.request.user.is_authenticated and value:
-            return queryset.filter(favorites__user=self.request.user)
+            return queryset.filter(Exists(model.objects.filter(
+                user=self.request.user, recipe_id=OuterRef('pk')
+            )))
         return queryset
 
+    def get_is_favorited(self, queryset, name, value):
+        return self.filter_user_collection(queryset, Favorite, value)
+
     def get_is_in_shopping_cart(self, queryset, name, value):
-        if self.request.user.is_authenticated and value:
-            return queryset.filter(carts__user=self.request.user)
-        return queryset
+        return self.filter_user_collection(queryset, ShoppingCart, value)
+
+    def get_search(self, queryset, name, value):
+        """
+        Полнотекстовый поиск по названию и описанию.
+
+        Результаты сортируются по релевантности, поэтому keyset-пагинация
+        (параметр cursor) с поиском не сочетается.
+        """
+        return search_recipes(queryset, value)
+
+    def get_ordering(self, queryset, name, value):
+        """
+        Сортирует рецепты по числу добавлений в избранное.
+
+        Используется счётчик favorites_count и индекс
+        recipe_popular_idx, без GROUP BY по избранному.
+        """
+        return queryset.order_by('-favorites_count', '-pub_date', '-id')
@@ -0,0 +1,60 @@
+from PIL import Image, UnidentifiedImageError
+from rest_framework import serializers
+
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+
+
+def image_too_large_message():
+    return (
+        'Размер картинки не должен превышать '
+        f'{settings.RECIPE_IMAGE_MAX_SIZE // (1024 * 1024)} МБ.'
+    )
+
+
+def validate_image(file):
+    """
+    Проверяет размер файла и разрешение картинки.
+
+    Разрешение читается из заголовка файла,
+    сама картинка при этом не декодируется.
+    """
+    if file.size > settings.RECIPE_IMAGE_MAX_SIZE:
+        raise serializers.ValidationError(image_too_large_message())
+    try:
+        with Image.open(file) as image:
+            width, height = image.size
+    except (UnidentifiedImageError, OSError):
+        # Некорректную картинку отклонит ImageField.
+        return
+    except Image.DecompressionBombError:
+        width = height = settings.RECIPE_IMAGE_MAX_PIXELS
+    finally:
+        file.seek(0)
+    if width * height > settings.RECIPE_IMAGE_MAX_PIXELS:
+        raise serializers.ValidationError(
+            'Разрешение картинки не должно превышать '
+            f'{settings.RECIPE_IMAGE_MAX_PIXELS // 1_000_000} Мп.'
+        )
+
+
+class RecipeImageUploadHandler(TemporaryFileUploadHandler):
+    """
+    Обработчик загрузки картинок рецептов.
+
+    Файл пишется во временный файл на диске порциями, поэтому
+    в памяти не держится. Загрузка прерывается, как только файл
+    превышает RECIPE_IMAGE_MAX_SIZE.
+    """
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.RECIPE_IMAGE_MAX_SIZE:
+            self.file.close()
+            raise serializers.ValidationError(
+                {self.field_name: [image_too_large_message()]}
+            )
+        return super().receive_data_chunk(raw_data, start)
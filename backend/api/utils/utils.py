@@ -3,24 +3,68 @@ import base64
 from rest_framework import serializers, status
 from rest_framework.response import Response
 
-from django.core.files.base import ContentFile
-from django.shortcuts import get_object_or_404
+from django.conf import settings
+from django.core.files.base import ContentFile, File
 
-from ingredients.models import Ingredient
+from api.utils.uploads import image_too_large_message, validate_image
+from recipes.images import (
+    DERIVATIVE_FORMATS,
+    DERIVATIVE_SIZES,
+    derivative_name,
+)
 from recipes.models import RecipeIngredient
 
 
 class Base64ImageField(serializers.ImageField):
-    """Вспомогательный класс для работы с изображениями."""
+    """
+    Вспомогательный класс для работы с изображениями.
+
+    Принимает картинку строкой base64 или файлом из multipart/form-data.
+    """
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
             format, imgstr = data.split(';base64,')
+            if len(imgstr) // 4 * 3 > settings.RECIPE_IMAGE_MAX_SIZE:
+                raise serializers.ValidationError(image_too_large_message())
             ext = format.split('/')[-1]
             data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+        if isinstance(data, File):
+            validate_image(data)
 
         return super().to_internal_value(data)
 
 
+class ImageDerivativesField(serializers.Field):
+    """
+    Вспомогательный класс для ссылок на уменьшенные копии картинки.
+
+    Возвращает {размер: {формат: url}}. Пока фоновая задача не создала
+    копии картинки рецепта, во всех размерах отдаётся оригинал.
+    """
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        kwargs['source'] = '*'
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        image = recipe.image
+        if not image:
+            return None
+        request = self.context.get('request')
+        ready = recipe.derivatives_image == image.name
+        urls = {}
+        for size in DERIVATIVE_SIZES:
+            urls[size] = {}
+            for file_format in DERIVATIVE_FORMATS:
+                url = image.storage.url(
+                    derivative_name(image.name, size, file_format)
+                ) if ready else image.url
+                urls[size][file_format] = (
+                    request.build_absolute_uri(url) if request else url
+                )
+        return urls
+
+
 def delete_model_instance(request, model_name, instance, error_message):
     """
     Вспомогательная функция для удаления рецепта
@@ -53,20 +97,57 @@ def create_ingredients(ingredients, recipe):
     """
     Вспомогательная функция для добавления ингредиентов.
 
-    Используется при создании/редактировании рецепта.
+    Используется при создании рецепта. Ингредиенты уже найдены
+    в БД при валидации.
     """
-    ingredient_list = []
-    for ingredient in ingredients:
-        current_ingredient = get_object_or_404(
-            Ingredient,
-            id=ingredient.get('id')
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(
+            recipe=recipe,
+            ingredient=ingredient['ingredient'],
+            amount=ingredient['amount']
         )
-        amount = ingredient.get('amount')
-        ingredient_list.append(
-            RecipeIngredient(
+        for ingredient in ingredients
+    )
+
+
+def sync_ingredients(ingredients, recipe):
+    """
+    Вспомогательная функция для обновления ингредиентов.
+
+    Используется при редактировании рецепта: сравнивает новый список
+    с текущими строками и удаляет, обновляет и добавляет только
+    изменившиеся. Возвращает изменения количеств
+    {id ингредиента: разница}.
+    """
+    current = {
+        recipe_ingredient.ingredient_id: recipe_ingredient
+        for recipe_ingredient in recipe.recipeingredients.all()
+    }
+    new = {
+        ingredient['ingredient'].pk: ingredient for ingredient in ingredients
+    }
+    deltas = {}
+    removed = current.keys() - new.keys()
+    if removed:
+        RecipeIngredient.objects.filter(
+            pk__in=[current[pk].pk for pk in removed]
+        ).delete()
+        deltas.update((pk, -current[pk].amount) for pk in removed)
+    changed = []
+    created = []
+    for pk, ingredient in new.items():
+        recipe_ingredient = current.get(pk)
+        if recipe_ingredient is None:
+            created.append(RecipeIngredient(
                 recipe=recipe,
-                ingredient=current_ingredient,
-                amount=amount
-            )
-        )
-    RecipeIngredient.objects.bulk_create(ingredient_list)
+                ingredient=ingredient['ingredient'],
+                amount=ingredient['amount']
+            ))
+            deltas[pk] = ingredient['amount']
+        elif recipe_ingredient.amount != ingredient['amount']:
+            deltas[pk] = ingredient['amount'] - recipe_ingredient.amount
+            recipe_ingredient.amount = ingredient['amount']
+            changed.append(recipe_ingredient)
+    RecipeIngredient.objects.bulk_update(changed, ['amount'])
+    RecipeIngredient.objects.bulk_create(created)
+    return deltas
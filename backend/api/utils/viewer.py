@@ -0,0 +1,107 @@
+from rest_framework import serializers
+
+from django.contrib.auth.models import AnonymousUser
+from django.db import models
+
+from recipes.models import Favorite, ShoppingCart
+from users.models import Subscription
+
+# Вид связи: (модель, поле с id объекта).
+RELATIONS = {
+    'favorite': (Favorite, 'recipe_id'),
+    'cart': (ShoppingCart, 'recipe_id'),
+    'subscription': (Subscription, 'author_id'),
+}
+
+
+class ViewerState:
+    """
+    Избранное, список покупок и подписки текущего пользователя
+    в пределах одного запроса.
+
+    Сериализаторы заранее регистрируют объекты, которые будут выведены
+    (prime). При первом обращении к признаку все зарегистрированные,
+    но ещё не проверенные id загружаются одним запросом на каждый
+    вид связи. Значения из аннотаций queryset'а запросов не требуют.
+    """
+    def __init__(self, user):
+        self.user = user
+        self._pending = {kind: set() for kind in RELATIONS}
+        self._known = {kind: {} for kind in RELATIONS}
+        if user.is_authenticated:
+            # На самого себя подписаться нельзя.
+            self._known['subscription'][user.pk] = False
+
+    def prime(self, kind, objects, key='pk', annotation=None):
+        """
+        Регистрирует объекты для пакетной загрузки признака kind.
+
+        key - атрибут с id объекта связи, annotation - атрибут
+        с уже вычисленным значением признака, если он есть.
+        """
+        known, pending = self._known[kind], self._pending[kind]
+        for obj in objects:
+            pk = getattr(obj, key)
+            if annotation and hasattr(obj, annotation):
+                known[pk] = getattr(obj, annotation)
+                pending.discard(pk)
+            elif pk not in known:
+                pending.add(pk)
+
+    def has(self, kind, pk):
+        """Возвращает признак kind для объекта с id pk."""
+        if not self.user.is_authenticated:
+            return False
+        known = self._known[kind]
+        if pk not in known:
+            self._load(kind, pk)
+        return known[pk]
+
+    def _load(self, kind, pk):
+        pending = self._pending[kind]
+        pending.add(pk)
+        model, field = RELATIONS[kind]
+        found = set(model.objects.filter(
+            user=self.user, **{f'{field}__in': pending}
+        ).values_list(field, flat=True))
+        self._known[kind].update((pk, pk in found) for pk in pending)
+        pending.clear()
+
+
+def get_viewer_state(request):
+    """Возвращает ViewerState запроса, создавая его при первом вызове."""
+    if request is None:
+        return ViewerState(AnonymousUser())
+    state = getattr(request, 'viewer_state', None)
+    if state is None:
+        state = request.viewer_state = ViewerState(request.user)
+    return state
+
+
+class ViewerStateListSerializer(serializers.ListSerializer):
+    """
+    Перед выводом списка регистрирует все его объекты в ViewerState,
+    чтобы признаки загрузились одним запросом на весь список.
+    """
+    def to_representation(self, data):
+        if isinstance(data, models.Manager):
+            data = data.all()
+        data = list(data)
+        self.child.prime_viewer_state(data)
+        return super().to_representation(data)
+
+
+class ViewerStateMixin:
+    """Даёт сериализатору доступ к ViewerState текущего запроса."""
+
+    @property
+    def viewer_state(self):
+        return get_viewer_state(self.context.get('request'))
+
+    def prime_viewer_state(self, instances):
+        """Регистрирует объекты, признаки которых будут выведены."""
+        raise NotImplementedError
+
+    def to_representation(self, instance):
+        self.prime_viewer_state([instance])
+        return super().to_representation(instance)
@@ -0,0 +1,108 @@
+from uuid import uuid4
+
+from django.core.cache import caches
+from django.utils.connection import ConnectionProxy
+
+# Сколько последних записей журнала перечитывается повторно: запись
+# с меньшим номером может зафиксироваться позже записи с большим.
+OVERLAP = 100
+# Насколько процесс может отстать от журнала, прежде чем перестроить
+# индекс целиком. Более старые записи удаляются.
+LIMIT = 1000
+CLEANUP_EVERY = 100
+version_cache = ConnectionProxy(caches, 'versions')
+
+
+class LogPosition:
+    """Версия индекса и номера записей журнала, учтённых процессом."""
+    def __init__(self, version=None, hint=None, applied=()):
+        self.version = version
+        self.hint = hint
+        self.applied = frozenset(applied)
+
+    @property
+    def sequence(self):
+        return max(self.applied, default=0)
+
+    def advance(self, pks, hint=None):
+        """Возвращает позицию, в которой учтены и записи pks."""
+        applied = self.applied.union(pks)
+        sequence = max(applied, default=0)
+        return LogPosition(
+            self.version, self.hint if hint is None else hint,
+            (pk for pk in applied if pk > sequence - OVERLAP)
+        )
+
+
+class ChangeLog:
+    """
+    Журнал изменений для индексов в памяти процессов.
+
+    Записи хранятся в модели-наследнике foodgram.models.ChangeLogEntry:
+    номера выдаёт БД, поэтому они уникальны при любом числе процессов.
+    В кэше versions лежат версия индекса, смена которой требует
+    перестроить его целиком, и метка последней записи: по ней процесс
+    без запроса к БД узнаёт, что журнал пополнился.
+    """
+    def __init__(self, model, name):
+        self.model = model
+        self.version_key = f'{name}:version'
+        self.hint_key = f'{name}:changes'
+
+    def state(self):
+        values = version_cache.get_many([self.version_key, self.hint_key])
+        version = values.get(self.version_key)
+        if version is None:
+            version_cache.add(self.version_key, uuid4().hex, None)
+            version = version_cache.get(self.version_key)
+        return version, values.get(self.hint_key)
+
+    def invalidate(self):
+        """Требует перестроить индекс во всех процессах."""
+        version_cache.set(self.version_key, uuid4().hex, None)
+
+    def append(self, object_ids):
+        """Записывает id изменённых объектов и возвращает номер записи."""
+        pk = self.model.objects.create(object_ids=sorted(object_ids)).pk
+        if pk % CLEANUP_EVERY == 0:
+            self.model.objects.filter(pk__lte=pk - LIMIT - OVERLAP).delete()
+        version_cache.set(self.hint_key, uuid4().hex, None)
+        return pk
+
+    def start(self):
+        """
+        Возвращает позицию для перестроения индекса.
+
+        Вызывается до чтения данных: записи, зафиксированные позже,
+        будут применены при следующей проверке журнала.
+        """
+        version, hint = self.state()
+        return LogPosition(version, hint, self.model.objects.order_by(
+            '-pk'
+        ).values_list('pk', flat=True)[:OVERLAP])
+
+    def pending(self, position):
+        """
+        Возвращает новую позицию и id объектов из записей, которые ещё
+        не применены, или None, если индекс нужно перестроить целиком.
+        """
+        version, hint = self.state()
+        if position is None or version != position.version:
+            return None
+        if hint == position.hint:
+            return position, set()
+        entries = [
+            (pk, object_ids)
+            for pk, object_ids in self.model.objects.filter(
+                pk__gt=position.sequence - OVERLAP
+            ).values_list('pk', 'object_ids')
+            if pk not in position.applied
+        ]
+        if entries and max(
+            pk for pk, _ in entries
+        ) - position.sequence > LIMIT:
+            return None
+        return (
+            position.advance([pk for pk, _ in entries], hint),
+            {pk for _, object_ids in entries for pk in object_ids}
+        )
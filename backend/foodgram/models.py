@@ -0,0 +1,33 @@
+from django.db import models
+
+
+class CounterFieldsMixin:
+    """
+    Не сохраняет через save() счётчики, которые ведут UPDATE с F().
+
+    Экземпляр мог быть загружен (или закэширован) до того, как счётчик
+    изменился в БД, и полный save() записал бы устаревшее значение.
+    Для существующей записи, если update_fields не переданы, сохраняются
+    все загруженные поля, кроме перечисленных в counter_fields.
+    """
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (not self._state.adding and kwargs.get('update_fields') is None
+                and not kwargs.get('force_insert')):
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.attname not in deferred
+                and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+class ChangeLogEntry(models.Model):
+    """Запись журнала foodgram.changelog.ChangeLog."""
+    object_ids = models.JSONField('Изменённые объекты')
+
+    class Meta:
+        abstract = True
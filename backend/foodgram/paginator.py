@@ -0,0 +1,49 @@
+import json
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Пагинатор админки с приблизительным числом записей.
+
+    В PostgreSQL число строк большой таблицы берётся из статистики
+    pg_class, а для отфильтрованного списка - из оценки планировщика
+    (EXPLAIN), вместо точного COUNT(*) по всей таблице. Если оценка
+    меньше ADMIN_EXACT_COUNT_LIMIT, записи считаются точно.
+    """
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if connections[queryset.db].vendor == 'postgresql':
+            estimate = self.estimate_count(queryset)
+            if (estimate is not None
+                    and estimate > settings.ADMIN_EXACT_COUNT_LIMIT):
+                return estimate
+        return super().count
+
+    def estimate_count(self, queryset):
+        connection = connections[queryset.db]
+        try:
+            with connection.cursor() as cursor:
+                if not queryset.query.where:
+                    cursor.execute(
+                        'SELECT reltuples FROM pg_class '
+                        'WHERE oid = %s::regclass',
+                        [connection.ops.quote_name(
+                            queryset.model._meta.db_table
+                        )]
+                    )
+                    row = cursor.fetchone()
+                    return int(row[0]) if row else None
+                sql, params = queryset.query.sql_with_params()
+                cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+                plan = cursor.fetchone()[0]
+        except DatabaseError:
+            return None
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -33,6 +34,7 @@ INSTALLED_APPS = [
     'api.apps.ApiConfig',
     'ingredients.apps.IngredientsConfig',
     'tags.apps.TagsConfig',
+    'jobs.apps.JobsConfig',
 ]
 
 MIDDLEWARE = [
@@ -76,6 +78,43 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.filebased.FileBasedCache'
+        ),
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION',
+            os.path.join(tempfile.gettempdir(), 'foodgram_cache')
+        ),
+    },
+    # Готовые ответы API для анонимных пользователей.
+    'responses': {
+        'BACKEND': os.getenv(
+            'RESPONSE_CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('RESPONSE_CACHE_LOCATION', 'foodgram-responses'),
+        'TIMEOUT': int(os.getenv('RESPONSE_CACHE_TIMEOUT', 300)),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    # Версии кэшей и счётчики. Бессрочные ключи не должны вытесняться,
+    # поэтому у них отдельный кэш с большим MAX_ENTRIES.
+    'versions': {
+        'BACKEND': os.getenv(
+            'VERSION_CACHE_BACKEND',
+            'django.core.cache.backends.filebased.FileBasedCache'
+        ),
+        'LOCATION': os.getenv(
+            'VERSION_CACHE_LOCATION',
+            os.path.join(tempfile.gettempdir(), 'foodgram_versions')
+        ),
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': 1000000},
+    },
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -117,13 +156,39 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.utils.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PAGINATION_CLASS': 'api.utils.pagination.PageLimitPagination',
     'PAGE_SIZE': 6,
 }
+# Сколько секунд пользователь токена хранится в кэше.
+AUTH_TOKEN_CACHE_TIMEOUT = int(os.getenv('AUTH_TOKEN_CACHE_TIMEOUT', 300))
+# Считать попадания в кэш ответов. Каждый запрос увеличивает счётчик
+# в кэше versions, поэтому включать только с бэкендом, где incr
+# атомарен (memcached, Redis).
+RESPONSE_CACHE_STATS = os.getenv('RESPONSE_CACHE_STATS', 'False') == 'True'
 
 EMPTY_VALUE = 'тишина'
+INGREDIENT_SEARCH_IN_MEMORY = os.getenv(
+    'INGREDIENT_SEARCH_IN_MEMORY', 'True'
+) == 'True'
+INGREDIENT_SEARCH_LIMIT = 50
+BULK_RECIPES_LIMIT = 100
+INGREDIENT_MATCH_LIMIT = 50
+SIMILAR_RECIPES_LIMIT = 20
+# Списки админки, в которых больше записей, считаются приблизительно.
+ADMIN_EXACT_COUNT_LIMIT = 10000
+SUBSCRIPTION_RECIPES_LIMIT = 10
+RECIPE_IMAGE_MAX_SIZE = 5 * 1024 * 1024
+RECIPE_IMAGE_MAX_PIXELS = 4096 * 4096
+# Фоновые задачи: при JOBS_EAGER выполняются сразу, без воркера.
+JOBS_EAGER = os.getenv('JOBS_EAGER', 'False') == 'True'
+JOBS_THREADS = int(os.getenv('JOBS_THREADS', 4))
+JOBS_RETRY_DELAY = 30
+JOBS_TIMEOUT = 600
+SHOPPING_LIST_FONT = os.getenv(
+    'SHOPPING_LIST_FONT', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
 REPEATING_DIGIT = 200
 
 DJOSER = {
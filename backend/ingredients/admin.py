@@ -4,11 +4,15 @@ from django.conf import settings
 from django.contrib import admin
 
 from .models import Ingredient
+from foodgram.paginator import EstimatedCountPaginator
 
 
 @admin.register(Ingredient)
 class IngredientAdmin(ImportExportModelAdmin, admin.ModelAdmin):
     list_display = ('pk', 'name', 'measurement_unit')
-    search_fields = ('name',)
-    list_filter = ('name',)
+    search_fields = ('^name',)
+    list_filter = ('measurement_unit',)
+    ordering = ('name',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = settings.EMPTY_VALUE
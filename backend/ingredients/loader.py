@@ -0,0 +1,151 @@
+import csv
+import json
+import re
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from ingredients.models import Ingredient
+
+CHUNK_SIZE = 1 << 16
+FIELDS = ('name', 'measurement_unit')
+SEPARATORS = re.compile(r'[\s,]*')
+
+
+def read_csv(file):
+    """Строки CSV (название, единица измерения), заголовок пропускается."""
+    rows = csv.reader(file)
+    for number, row in enumerate(rows):
+        if number == 0 and tuple(row) == FIELDS:
+            continue
+        yield row
+
+
+def read_ndjson(file):
+    """Объекты из файла с одним JSON-объектом на строке."""
+    for line in file:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield None
+
+
+def read_json(file, chunk_size=CHUNK_SIZE):
+    """
+    Элементы JSON-массива верхнего уровня.
+
+    Файл читается блоками по chunk_size символов, каждый элемент
+    разбирается отдельно, поэтому весь массив не держится в памяти.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    while not buffer.strip():
+        chunk = file.read(chunk_size)
+        if not chunk:
+            raise ValueError('Пустой JSON-файл.')
+        buffer += chunk
+    buffer = buffer.lstrip()
+    if not buffer.startswith('['):
+        raise ValueError('Ожидается JSON-массив ингредиентов.')
+    position = 1
+    while True:
+        position = SEPARATORS.match(buffer, position).end()
+        if buffer.startswith(']', position):
+            return
+        try:
+            record, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                raise ValueError('Некорректный JSON-файл.')
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+        yield record
+
+
+READERS = {
+    'csv': read_csv,
+    'json': read_json,
+    'ndjson': read_ndjson,
+}
+
+
+def clean(record):
+    """Возвращает ключ (название, единица измерения) или None."""
+    try:
+        if isinstance(record, dict):
+            name, unit = record['name'], record['measurement_unit']
+        elif isinstance(record, (list, tuple)):
+            name, unit = record
+        else:
+            return None
+        name, unit = name.strip(), unit.strip()
+    except (AttributeError, KeyError, ValueError):
+        return None
+    limit = settings.REPEATING_DIGIT
+    if not name or not unit or len(name) > limit or len(unit) > limit:
+        return None
+    return name, unit
+
+
+def insert_missing(keys):
+    """
+    Вставляет пары (название, единица измерения), пропуская уже
+    существующие по уникальному ограничению. Возвращает число
+    добавленных строк.
+
+    В PostgreSQL пачка передаётся двумя массивами в один
+    INSERT ... SELECT FROM unnest, в остальных СУБД - через executemany.
+    """
+    if not keys:
+        return 0
+    table = connection.ops.quote_name(Ingredient._meta.db_table)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            names, units = zip(*keys)
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit) '
+                'SELECT * FROM unnest(%s::varchar[], %s::varchar[]) '
+                'ON CONFLICT DO NOTHING',
+                [list(names), list(units)]
+            )
+        else:
+            cursor.executemany(
+                f'INSERT INTO {table} (name, measurement_unit) '
+                'VALUES (%s, %s) ON CONFLICT DO NOTHING',
+                keys
+            )
+        return cursor.rowcount
+
+
+def load_ingredients(records, batch_size=1000):
+    """
+    Добавляет в справочник ингредиенты, которых в нём ещё нет.
+
+    Записи обрабатываются пачками по batch_size, каждая пачка -
+    одна транзакция. Повторный запуск ничего не меняет.
+    Возвращает словарь со счётчиками inserted, existing
+    и skipped (повторы и некорректные записи).
+    """
+    stats = {'inserted': 0, 'existing': 0, 'skipped': 0}
+    seen = set()
+    records = iter(records)
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            return stats
+        keys = []
+        for record in batch:
+            key = clean(record)
+            if key is None or key in seen:
+                stats['skipped'] += 1
+                continue
+            seen.add(key)
+            keys.append(key)
+        with transaction.atomic():
+            inserted = insert_missing(keys)
+        stats['inserted'] += inserted
+        stats['existing'] += len(keys) - inserted
@@ -0,0 +1,43 @@
+from django.db import DatabaseError, migrations, transaction
+
+
+def create_indexes(apps, schema_editor):
+    """
+    Индексы для поиска ингредиентов по названию в PostgreSQL.
+
+    text_pattern_ops обслуживает LIKE 'запрос%' по lower(name),
+    триграммный индекс - LIKE '%запрос%', если доступно расширение pg_trgm.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS ingredient_name_lower_like_idx '
+        'ON ingredients_ingredient (lower(name) text_pattern_ops)'
+    )
+    try:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    except DatabaseError:
+        return
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS ingredient_name_lower_trgm_idx '
+        'ON ingredients_ingredient USING gin (lower(name) gin_trgm_ops)'
+    )
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS ingredient_name_lower_like_idx')
+    schema_editor.execute('DROP INDEX IF EXISTS ingredient_name_lower_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ingredients', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 3.2 on 2026-10-18 20:10
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicates(apps, schema_editor):
+    """
+    Объединяет ингредиенты с одинаковыми названием и единицей измерения.
+
+    Ссылки рецептов и списков покупок переносятся на ингредиент
+    с наименьшим id, остальные копии удаляются.
+    """
+    Ingredient = apps.get_model('ingredients', 'Ingredient')
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    ShoppingListItem = apps.get_model('recipes', 'ShoppingListItem')
+    duplicates = Ingredient.objects.values(
+        'name', 'measurement_unit'
+    ).annotate(keep=Min('id'), total=Count('id')).filter(total__gt=1)
+    for group in duplicates:
+        copies = list(Ingredient.objects.filter(
+            name=group['name'], measurement_unit=group['measurement_unit']
+        ).exclude(id=group['keep']).values_list('id', flat=True))
+        RecipeIngredient.objects.filter(ingredient_id__in=copies).update(
+            ingredient_id=group['keep']
+        )
+        for item in ShoppingListItem.objects.filter(
+            ingredient_id__in=copies
+        ):
+            kept, created = ShoppingListItem.objects.get_or_create(
+                user_id=item.user_id, ingredient_id=group['keep'],
+                defaults={'amount': item.amount}
+            )
+            if not created:
+                kept.amount += item.amount
+                kept.save(update_fields=['amount'])
+            item.delete()
+        Ingredient.objects.filter(id__in=copies).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ingredients', '0002_ingredient_name_search_indexes'),
+        ('recipes', '0008_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='unique_ingredient_name_unit'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 3.2 on 2026-10-18 21:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ingredients', '0003_unique_ingredient'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngredientChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_ids', models.JSONField(verbose_name='Изменённые объекты')),
+            ],
+            options={
+                'verbose_name': 'Изменение ингредиентов',
+                'verbose_name_plural': 'Изменения ингредиентов',
+            },
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.conf import settings
 from django.db import models
 
+from foodgram.models import ChangeLogEntry
+
 
 class Ingredient(models.Model):
     name = models.CharField(
@@ -13,8 +15,28 @@ class Ingredient(models.Model):
     )
 
     class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='unique_ingredient_name_unit'
+            )
+        ]
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
 
     def __str__(self):
         return self.name
+
+
+class IngredientChange(ChangeLogEntry):
+    """
+    Изменённые ингредиенты: по этому журналу процессы обновляют
+    индекс автодополнения.
+    """
+
+    class Meta:
+        verbose_name = 'Изменение ингредиентов'
+        verbose_name_plural = 'Изменения ингредиентов'
+
+    def __str__(self):
+        return f'{self.pk}: {self.object_ids}'
@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.contrib import admin
+
+from .models import Job
+from foodgram.paginator import EstimatedCountPaginator
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk', 'name', 'status', 'attempts', 'user',
+        'created_at', 'finished_at'
+    )
+    search_fields = ('name', 'dedup_key')
+    list_filter = ('status', 'name')
+    list_select_related = ('user',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    readonly_fields = ('created_at', 'started_at', 'finished_at')
+    empty_value_display = settings.EMPTY_VALUE
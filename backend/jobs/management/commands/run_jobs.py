@@ -0,0 +1,73 @@
+import os
+import signal
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from jobs.queue import claim_jobs, requeue_stale_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = (
+        'Запускает воркер фоновых задач: забирает задачи из очереди в БД '
+        'и выполняет их в пуле потоков.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads', type=int, default=settings.JOBS_THREADS,
+            help='Сколько задач выполнять одновременно.'
+        )
+        parser.add_argument(
+            '--poll', type=float, default=1.0,
+            help='Пауза между проверками очереди, в секундах.'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить задачи, готовые к запуску, и завершиться.'
+        )
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        threads = options['threads']
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+        self.stdout.write(f'Воркер {worker} запущен, потоков: {threads}')
+        running = set()
+        checked_stale = 0
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            while not self.stopping:
+                close_old_connections()
+                if time.monotonic() - checked_stale > settings.JOBS_TIMEOUT:
+                    requeue_stale_jobs()
+                    checked_stale = time.monotonic()
+                running = {future for future in running if not future.done()}
+                jobs = claim_jobs(threads - len(running), worker)
+                for job in jobs:
+                    running.add(pool.submit(self.process, job))
+                if jobs:
+                    continue
+                if options['once'] and not running:
+                    break
+                if running:
+                    wait(running, timeout=options['poll'],
+                         return_when=FIRST_COMPLETED)
+                else:
+                    time.sleep(options['poll'])
+            wait(running)
+        self.stdout.write(f'Воркер {worker} остановлен')
+
+    def stop(self, *args):
+        self.stopping = True
+
+    def process(self, job):
+        try:
+            job = run_job(job)
+            self.stdout.write(f'{job}: попытка {job.attempts}')
+        finally:
+            connections.close_all()
@@ -0,0 +1,108 @@
+from django.conf import settings
+from django.db import models
+from django.db.models import Q
+
+from users.models import User
+
+
+class Job(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    )
+
+    name = models.CharField(
+        'Задача',
+        max_length=settings.REPEATING_DIGIT,
+    )
+    kwargs = models.JSONField(
+        'Аргументы',
+        default=dict,
+    )
+    status = models.CharField(
+        'Статус',
+        max_length=16,
+        choices=STATUSES,
+        default=QUEUED,
+    )
+    worker = models.CharField(
+        'Воркер',
+        max_length=255,
+        blank=True,
+    )
+    dedup_key = models.CharField(
+        'Ключ дедупликации',
+        max_length=255,
+        blank=True,
+        null=True,
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='jobs',
+        verbose_name='Пользователь',
+        blank=True,
+        null=True,
+    )
+    attempts = models.PositiveSmallIntegerField(
+        'Попыток',
+        default=0,
+    )
+    max_attempts = models.PositiveSmallIntegerField(
+        'Максимум попыток',
+        default=1,
+    )
+    run_at = models.DateTimeField(
+        'Запустить не раньше',
+    )
+    started_at = models.DateTimeField(
+        'Начало выполнения',
+        blank=True,
+        null=True,
+    )
+    finished_at = models.DateTimeField(
+        'Завершена',
+        blank=True,
+        null=True,
+    )
+    created_at = models.DateTimeField(
+        'Создана',
+        auto_now_add=True,
+    )
+    result = models.JSONField(
+        'Результат',
+        blank=True,
+        null=True,
+    )
+    error = models.TextField(
+        'Ошибка',
+        blank=True,
+    )
+
+    class Meta:
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        ordering = ('-id',)
+        indexes = [
+            models.Index(
+                fields=['run_at', 'id'],
+                condition=Q(status='queued'),
+                name='job_queue_idx',
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dedup_key'],
+                condition=Q(status='queued'),
+                name='unique_queued_job_dedup_key',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk} ({self.status})'
@@ -0,0 +1,156 @@
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from jobs.models import Job
+
+logger = logging.getLogger(__name__)
+
+# Зарегистрированные задачи: имя -> (функция, максимум попыток).
+TASKS = {}
+DUPLICATE_RETRY_ERROR = (
+    '\nВ очереди уже есть такая же задача, повтор отменён.'
+)
+
+
+def task(name, max_attempts=1):
+    """Регистрирует функцию как фоновую задачу."""
+    def decorator(function):
+        TASKS[name] = (function, max_attempts)
+        return function
+    return decorator
+
+
+def enqueue(name, kwargs=None, dedup_key=None, user=None, delay=0):
+    """
+    Ставит задачу в очередь и возвращает её.
+
+    Если в очереди уже есть задача с тем же dedup_key, новая
+    не создаётся и возвращается существующая. При JOBS_EAGER
+    задача выполняется сразу, без воркера.
+    """
+    _, max_attempts = TASKS[name]
+    queued = Job.objects.filter(dedup_key=dedup_key, status=Job.QUEUED)
+    if dedup_key:
+        job = queued.first()
+        if job is not None:
+            return job
+    try:
+        with transaction.atomic():
+            job = Job.objects.create(
+                name=name,
+                kwargs=kwargs or {},
+                dedup_key=dedup_key,
+                user=user,
+                max_attempts=max_attempts,
+                run_at=timezone.now() + timedelta(seconds=delay),
+            )
+    except IntegrityError:
+        return queued.get()
+    if settings.JOBS_EAGER:
+        while job.status == Job.QUEUED:
+            job.status = Job.RUNNING
+            job.attempts += 1
+            job.worker = 'eager'
+            job.save(update_fields=('status', 'attempts', 'worker'))
+            run_job(job)
+    return job
+
+
+def claim_jobs(limit, worker):
+    """
+    Забирает до limit готовых к запуску задач для воркера.
+
+    На PostgreSQL строки выбираются через FOR UPDATE SKIP LOCKED,
+    и несколько воркеров не ждут друг друга. Условный UPDATE
+    не даёт двум воркерам взять одну задачу и на остальных БД.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(Job.objects.select_for_update(skip_locked=True).filter(
+            status=Job.QUEUED, run_at__lte=now
+        ).order_by('run_at', 'id').values_list('id', flat=True)[:limit])
+        if not ids:
+            return []
+        Job.objects.filter(pk__in=ids, status=Job.QUEUED).update(
+            status=Job.RUNNING,
+            worker=worker,
+            started_at=now,
+            attempts=F('attempts') + 1,
+        )
+    return list(Job.objects.filter(
+        pk__in=ids, status=Job.RUNNING, worker=worker, started_at=now
+    ))
+
+
+def finish_job(job, **fields):
+    """
+    Сохраняет итог задачи, если её не забрал другой воркер.
+
+    Повтор, который совпал по dedup_key с уже поставленной задачей,
+    не нужен и завершается ошибкой.
+    """
+    running = Job.objects.filter(
+        pk=job.pk, status=Job.RUNNING, worker=job.worker
+    )
+    try:
+        with transaction.atomic():
+            running.update(**fields)
+    except IntegrityError:
+        fields.update(
+            status=Job.FAILED,
+            finished_at=timezone.now(),
+            error=fields.get('error', '') + DUPLICATE_RETRY_ERROR,
+        )
+        running.update(**fields)
+    for key, value in fields.items():
+        setattr(job, key, value)
+    return job
+
+
+def run_job(job):
+    """Выполняет захваченную задачу и сохраняет результат или ошибку."""
+    function, _ = TASKS.get(job.name, (None, None))
+    try:
+        if function is None:
+            raise LookupError(f'Задача {job.name} не зарегистрирована.')
+        result = function(**job.kwargs)
+    except Exception:
+        logger.exception('Ошибка в задаче %s', job)
+        now = timezone.now()
+        error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            delay = settings.JOBS_RETRY_DELAY * 2 ** (job.attempts - 1)
+            return finish_job(
+                job, status=Job.QUEUED, error=error,
+                run_at=now + timedelta(seconds=delay),
+            )
+        return finish_job(
+            job, status=Job.FAILED, error=error, finished_at=now
+        )
+    return finish_job(
+        job, status=Job.DONE, result=result, error='',
+        finished_at=timezone.now(),
+    )
+
+
+def requeue_stale_jobs():
+    """
+    Возвращает в очередь задачи, которые выполняются дольше JOBS_TIMEOUT.
+
+    Так задачи упавшего воркера не зависают в статусе "выполняется".
+    """
+    threshold = timezone.now() - timedelta(seconds=settings.JOBS_TIMEOUT)
+    stale = Job.objects.filter(status=Job.RUNNING, started_at__lt=threshold)
+    for job in stale:
+        if job.attempts < job.max_attempts:
+            finish_job(job, status=Job.QUEUED, run_at=timezone.now(),
+                       error='Превышено время выполнения.')
+        else:
+            finish_job(job, status=Job.FAILED, finished_at=timezone.now(),
+                       error='Превышено время выполнения.')
@@ -1,13 +1,19 @@
 from django.conf import settings
 from django.contrib import admin
 
+from foodgram.paginator import EstimatedCountPaginator
 from recipes.models import Favorite, Recipe, RecipeIngredient, ShoppingCart
+from recipes.shopping_list import track_recipe_ingredients
 
 
 @admin.register(ShoppingCart)
 class ShoppingCartAdmin(admin.ModelAdmin):
     list_display = ('pk', 'user', 'recipe')
-    search_fields = ('user', 'recipe')
+    search_fields = ('^user__username', '^user__email', '^recipe__name')
+    list_select_related = ('user', 'recipe')
+    autocomplete_fields = ('user', 'recipe')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = settings.EMPTY_VALUE
 
 
@@ -15,32 +21,75 @@ class RecipeIngredientInline(admin.TabularInline):
     model = RecipeIngredient
     extra = 2
     min_num = 1
+    autocomplete_fields = ('ingredient', )
 
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('pk', 'name', 'author', 'favorites_amount')
-    search_fields = ('name', 'author')
-    list_filter = ('name', 'author', 'tags')
+    list_display = (
+        'pk', 'name', 'author', 'favorites_amount', 'carts_count',
+        'pub_date'
+    )
+    search_fields = ('name', '^author__username', '^author__email')
+    list_filter = ('tags', )
+    list_select_related = ('author', )
+    autocomplete_fields = ('author', )
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = settings.EMPTY_VALUE
     inlines = [
         RecipeIngredientInline,
     ]
     filter_horizontal = ('tags', )
 
-    @admin.display(description='количество фолловеров данного шедевра')
+    @admin.display(
+        description='количество фолловеров данного шедевра',
+        ordering='favorites_count'
+    )
     def favorites_amount(self, obj):
-        return obj.favorites.count()
+        return obj.favorites_count
+
+    def save_related(self, request, form, formsets, change):
+        with track_recipe_ingredients([form.instance.pk]):
+            super().save_related(request, form, formsets, change)
 
 
 @admin.register(RecipeIngredient)
 class RecipeIngredientAdmin(admin.ModelAdmin):
     list_display = ('pk', 'recipe', 'ingredient', 'amount')
+    search_fields = ('^recipe__name', '^ingredient__name')
+    list_select_related = ('recipe', 'ingredient')
+    autocomplete_fields = ('recipe', 'ingredient')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = settings.EMPTY_VALUE
 
+    def save_model(self, request, obj, form, change):
+        recipe_ids = [obj.recipe_id]
+        if change:
+            recipe_ids.extend(RecipeIngredient.objects.filter(
+                pk=obj.pk
+            ).values_list('recipe_id', flat=True))
+        with track_recipe_ingredients(recipe_ids):
+            super().save_model(request, obj, form, change)
+
+    def delete_model(self, request, obj):
+        with track_recipe_ingredients([obj.recipe_id]):
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        with track_recipe_ingredients(
+            queryset.values_list('recipe_id', flat=True)
+        ):
+            super().delete_queryset(request, queryset)
+
 
 @admin.register(Favorite)
 class FavoriteAdmin(admin.ModelAdmin):
     list_display = ('pk', 'user', 'recipe')
-    search_fields = ('user', 'recipe')
+    search_fields = ('^user__username', '^user__email', '^recipe__name')
+    list_select_related = ('user', 'recipe')
+    autocomplete_fields = ('user', 'recipe')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = settings.EMPTY_VALUE
@@ -0,0 +1,78 @@
+from django.db import connection, transaction
+
+from recipes.counters import RECIPE_COUNTERS, change_counter
+from recipes.models import Recipe, ShoppingCart
+from recipes.shopping_list import add_to_shopping_list
+
+
+def _execute(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return sorted(row[0] for row in cursor.fetchall())
+
+
+def _columns(model):
+    quote = connection.ops.quote_name
+    return (
+        quote(model._meta.db_table),
+        quote(model._meta.get_field('user').column),
+        quote(model._meta.get_field('recipe').column),
+    )
+
+
+def _recipe_columns():
+    quote = connection.ops.quote_name
+    return quote(Recipe._meta.db_table), quote(Recipe._meta.pk.column)
+
+
+def add_user_recipes(model, user_id, recipe_ids):
+    """
+    Добавляет рецепты в избранное или список покупок пользователя.
+
+    Выполняется одним INSERT ... ON CONFLICT DO NOTHING RETURNING:
+    несуществующие рецепты пропускаются, повторное добавление
+    ничего не меняет, а счётчики увеличиваются только у добавленных.
+    Возвращает id действительно добавленных рецептов.
+    """
+    recipe_ids = sorted(set(recipe_ids))
+    if not recipe_ids:
+        return []
+    table, user_column, recipe_column = _columns(model)
+    recipe_table, recipe_pk = _recipe_columns()
+    placeholders = ', '.join(['%s'] * len(recipe_ids))
+    with transaction.atomic():
+        added = _execute(
+            f'INSERT INTO {table} ({user_column}, {recipe_column}) '
+            f'SELECT %s, {recipe_pk} FROM {recipe_table} '
+            f'WHERE {recipe_pk} IN ({placeholders}) '
+            f'ON CONFLICT DO NOTHING RETURNING {recipe_column}',
+            [user_id, *recipe_ids]
+        )
+        change_counter(Recipe, added, RECIPE_COUNTERS[model], 1)
+        if model is ShoppingCart and added:
+            add_to_shopping_list(user_id, added)
+    return added
+
+
+def remove_user_recipes(model, user_id, recipe_ids):
+    """
+    Убирает рецепты из избранного или списка покупок одним DELETE.
+
+    Возвращает id действительно удалённых рецептов.
+    """
+    recipe_ids = sorted(set(recipe_ids))
+    if not recipe_ids:
+        return []
+    table, user_column, recipe_column = _columns(model)
+    placeholders = ', '.join(['%s'] * len(recipe_ids))
+    with transaction.atomic():
+        removed = _execute(
+            f'DELETE FROM {table} WHERE {user_column} = %s '
+            f'AND {recipe_column} IN ({placeholders}) '
+            f'RETURNING {recipe_column}',
+            [user_id, *recipe_ids]
+        )
+        change_counter(Recipe, removed, RECIPE_COUNTERS[model], -1)
+        if model is ShoppingCart and removed:
+            add_to_shopping_list(user_id, removed, sign=-1)
+    return removed
@@ -0,0 +1,58 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscription, User
+
+# Счётчики: (модель, поле счётчика, модель строк, поле связи строк).
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'carts_count', ShoppingCart, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Subscription, 'author'),
+)
+# Какой счётчик рецепта меняет добавление в коллекцию.
+RECIPE_COUNTERS = {
+    Favorite: 'favorites_count',
+    ShoppingCart: 'carts_count',
+}
+
+
+def change_counter(model, pks, field, delta):
+    """Атомарно прибавляет delta к счётчику одним UPDATE."""
+    if pks and delta:
+        model.objects.filter(pk__in=pks).update(**{field: F(field) + delta})
+
+
+def actual_count(source, relation):
+    """Подзапрос с фактическим количеством строк для OuterRef('pk')."""
+    return Coalesce(Subquery(
+        source.objects.filter(
+            **{relation: OuterRef('pk')}
+        ).order_by().values(relation).annotate(
+            total=Count('pk')
+        ).values('total')
+    ), 0)
+
+
+def reconcile_counters(fix=True):
+    """
+    Сверяет счётчики с фактическим количеством строк.
+
+    Разошедшиеся счётчики исправляются, если передан fix.
+    Возвращает {имя счётчика: сколько записей разошлось}.
+    """
+    drift = {}
+    for model, field, source, relation in COUNTERS:
+        actual = actual_count(source, relation)
+        drifted = model.objects.alias(
+            actual=actual
+        ).exclude(**{field: F('actual')}).values_list('pk', flat=True)
+        name = f'{model._meta.model_name}.{field}'
+        if fix:
+            drift[name] = model.objects.filter(
+                pk__in=drifted
+            ).update(**{field: actual})
+        else:
+            drift[name] = drifted.count()
+    return drift
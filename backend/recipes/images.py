@@ -0,0 +1,131 @@
+import hashlib
+import os
+from io import BytesIO
+
+from PIL import Image, ImageOps
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+IMAGES_DIR = 'recipes'
+# Уменьшенные копии: имя -> (ширина, высота, обрезать ли до размера).
+# Копии строятся от большей к меньшей, каждая следующая - из предыдущей.
+DERIVATIVE_SIZES = {
+    'full': (1280, 1280, False),
+    'card': (480, 480, False),
+    'thumbnail': (160, 160, True),
+}
+DERIVATIVE_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+JPEG_BACKGROUND = (255, 255, 255)
+
+
+def recipe_image_path(instance, filename):
+    """
+    Возвращает путь картинки рецепта по хешу её содержимого.
+
+    Одинаковые картинки получают одно имя и хранятся один раз.
+    """
+    content = instance.image.file
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    digest = digest.hexdigest()
+    extension = os.path.splitext(filename)[1].lower()
+    return f'{IMAGES_DIR}/{digest[:2]}/{digest}{extension}'
+
+
+@deconstructible
+class DeduplicatedFileSystemStorage(FileSystemStorage):
+    """
+    Файловое хранилище без дублей.
+
+    Если файл с таким именем уже есть, он не перезаписывается
+    и не сохраняется повторно под другим именем.
+    """
+    def save(self, name, content, max_length=None):
+        if name is not None and self.exists(name):
+            return name
+        return super().save(name, content, max_length)
+
+
+# Хранилище только для картинок рецептов: у остальных файлов имена
+# не зависят от содержимого, и пропускать существующие нельзя.
+recipe_image_storage = DeduplicatedFileSystemStorage()
+
+
+def derivative_name(name, size, file_format):
+    root, _ = os.path.splitext(name)
+    return f'{root}-{size}.{file_format}'
+
+
+def derivative_names(name):
+    return [
+        derivative_name(name, size, file_format)
+        for size in DERIVATIVE_SIZES
+        for file_format in DERIVATIVE_FORMATS
+    ]
+
+
+def resize(image, width, height, crop):
+    if crop:
+        return ImageOps.fit(image, (width, height), Image.LANCZOS)
+    image = image.copy()
+    image.thumbnail((width, height), Image.LANCZOS)
+    return image
+
+
+def encode(image, file_format):
+    pil_format, options = DERIVATIVE_FORMATS[file_format]
+    if pil_format == 'JPEG' and image.mode != 'RGB':
+        background = Image.new('RGB', image.size, JPEG_BACKGROUND)
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    buffer = BytesIO()
+    image.save(buffer, pil_format, **options)
+    return ContentFile(buffer.getvalue())
+
+
+def create_derivatives(name, storage=recipe_image_storage, force=False):
+    """
+    Создаёт уменьшенные копии картинки во всех размерах и форматах.
+
+    Уже существующие копии не пересоздаются, если не передан force.
+    Возвращает количество созданных файлов.
+    """
+    missing = {
+        size: [
+            file_format for file_format in DERIVATIVE_FORMATS
+            if force or not storage.exists(
+                derivative_name(name, size, file_format)
+            )
+        ]
+        for size in DERIVATIVE_SIZES
+    }
+    if not any(missing.values()):
+        return 0
+    created = 0
+    with storage.open(name, 'rb') as file, Image.open(file) as image:
+        width, height, _ = DERIVATIVE_SIZES['full']
+        # Для JPEG декодирует сразу в уменьшенном масштабе.
+        image.draft('RGB', (width, height))
+        source = ImageOps.exif_transpose(image)
+        if source.mode not in ('RGB', 'RGBA'):
+            source = source.convert(
+                'RGBA' if source.mode in ('LA', 'P', 'PA') else 'RGB'
+            )
+        for size, (width, height, crop) in DERIVATIVE_SIZES.items():
+            derivative = resize(source, width, height, crop)
+            if not crop:
+                source = derivative
+            for file_format in missing[size]:
+                target = derivative_name(name, size, file_format)
+                if force and storage.exists(target):
+                    storage.delete(target)
+                storage.save(target, encode(derivative, file_format))
+                created += 1
+    return created
@@ -0,0 +1,183 @@
+import heapq
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+from django.db import transaction
+
+from foodgram.changelog import ChangeLog
+from recipes.models import RecipeIngredient, RecipeIngredientChange
+
+BATCH_SIZE = 10000
+change_log = ChangeLog(RecipeIngredientChange, 'recipe_ingredient_index')
+
+
+def update_posting(posting, changes):
+    """
+    Возвращает копию отсортированного массива id рецептов, в которую
+    добавлены рецепты с changes[id] = True и из которой убраны
+    рецепты с changes[id] = False.
+    """
+    members = array('q', posting)
+    for pk, included in changes.items():
+        position = bisect_left(members, pk)
+        present = position < len(members) and members[position] == pk
+        if included and not present:
+            members.insert(position, pk)
+        elif present and not included:
+            del members[position]
+    return members
+
+
+class RankedRecipes:
+    """
+    Рецепты, найденные по набору ингредиентов, в порядке релевантности.
+
+    Ведёт себя как последовательность для Paginator: сортируется
+    не весь результат, а только рецепты до конца запрошенной страницы.
+    Элементы - пары (id рецепта, сколько его ингредиентов есть).
+    """
+    def __init__(self, counts, sizes):
+        self._counts = counts
+        self._sizes = sizes
+
+    def __len__(self):
+        return len(self._counts)
+
+    def _key(self, item):
+        recipe_id, covered = item
+        return -covered, self._sizes[recipe_id] - covered, -recipe_id
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop, _ = index.indices(len(self))
+        return heapq.nsmallest(
+            stop, self._counts.items(), key=self._key
+        )[start:]
+
+
+class RecipeIngredientIndex:
+    """
+    Инвертированный индекс ингредиент -> рецепты в памяти процесса.
+
+    Для каждого ингредиента хранится отсортированный массив id рецептов,
+    а для каждого рецепта - кортеж id его ингредиентов. Индекс строится
+    из БД при смене версии в общем кэше Django. Изменённые рецепты
+    записываются в журнал RecipeIngredientChange: каждый процесс
+    перечитывает из БД только рецепты из ещё не применённых записей.
+    """
+    def __init__(self):
+        self.position = None
+        self._postings = {}
+        self._recipes = {}
+
+    def invalidate(self):
+        """Требует перестроить индекс во всех процессах."""
+        change_log.invalidate()
+
+    def build(self, rows, position=None):
+        """Строит индекс из пар (id ингредиента, id рецепта)."""
+        postings = defaultdict(list)
+        recipes = defaultdict(list)
+        for ingredient_id, recipe_id in rows:
+            postings[ingredient_id].append(recipe_id)
+            recipes[recipe_id].append(ingredient_id)
+        self._set(
+            {
+                pk: array('q', sorted(set(recipe_ids)))
+                for pk, recipe_ids in postings.items()
+            },
+            {
+                pk: tuple(sorted(set(ingredient_ids)))
+                for pk, ingredient_ids in recipes.items()
+            },
+            position
+        )
+
+    def _set(self, postings, recipes, position):
+        self._postings, self._recipes, self.position = (
+            postings, recipes, position
+        )
+
+    def ensure_fresh(self):
+        """Применяет новые записи журнала или перестраивает индекс."""
+        pending = change_log.pending(self.position)
+        if pending is None:
+            position = change_log.start()
+            self.build(
+                RecipeIngredient.objects.values_list(
+                    'ingredient_id', 'recipe_id'
+                ).order_by().iterator(chunk_size=BATCH_SIZE),
+                position
+            )
+            return
+        position, recipe_ids = pending
+        if recipe_ids:
+            self._apply(recipe_ids, position)
+        else:
+            self.position = position
+
+    def refresh(self, recipe_ids):
+        """
+        Записывает изменение рецептов в журнал после фиксации транзакции.
+
+        Текущий процесс сразу применяет его к своему индексу, остальные -
+        при следующем поиске. В обоих случаях из БД перечитываются
+        только ингредиенты этих рецептов.
+        """
+        recipe_ids = {pk for pk in recipe_ids if pk}
+        if recipe_ids:
+            transaction.on_commit(lambda: self._refresh(recipe_ids))
+
+    def _refresh(self, recipe_ids):
+        pk = change_log.append(recipe_ids)
+        if self.position is not None:
+            self._apply(recipe_ids, self.position.advance([pk]))
+
+    def _apply(self, recipe_ids, position):
+        current = defaultdict(set)
+        for recipe_id, ingredient_id in RecipeIngredient.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list('recipe_id', 'ingredient_id'):
+            current[recipe_id].add(ingredient_id)
+        postings = dict(self._postings)
+        recipes = dict(self._recipes)
+        changed = defaultdict(set)
+        for recipe_id in recipe_ids:
+            for ingredient_id in recipes.pop(recipe_id, ()):
+                changed[ingredient_id].add(recipe_id)
+            if current[recipe_id]:
+                recipes[recipe_id] = tuple(sorted(current[recipe_id]))
+                for ingredient_id in current[recipe_id]:
+                    changed[ingredient_id].add(recipe_id)
+        for ingredient_id, affected in changed.items():
+            members = update_posting(
+                postings.get(ingredient_id, ()), {
+                    pk: ingredient_id in current[pk] for pk in affected
+                }
+            )
+            if members:
+                postings[ingredient_id] = members
+            else:
+                postings.pop(ingredient_id, None)
+        self._set(postings, recipes, position)
+
+    def search(self, ingredient_ids):
+        """
+        Возвращает рецепты, в которых есть хотя бы один из ингредиентов.
+
+        Рецепты упорядочены по числу имеющихся ингредиентов, затем
+        по числу недостающих, затем от новых к старым.
+        """
+        self.ensure_fresh()
+        postings, recipes = self._postings, self._recipes
+        counts = Counter()
+        for pk in set(ingredient_ids):
+            counts.update(postings.get(pk, ()))
+        return RankedRecipes(
+            counts, {pk: len(recipes[pk]) for pk in counts}
+        )
+
+
+recipe_ingredient_index = RecipeIngredientIndex()
@@ -0,0 +1,44 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.recommendations import build_similar_recipes
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает похожие рецепты по совместным добавлениям '
+        'в избранное (косинусная близость).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top-k', type=int, default=settings.SIMILAR_RECIPES_LIMIT,
+            help='Сколько похожих рецептов хранить для каждого рецепта.'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=500,
+            help='Сколько рецептов обрабатывать за раз: ограничивает '
+                 'размер полосы матрицы близости в памяти.'
+        )
+        parser.add_argument(
+            '--cart-weight', type=float, default=0.0,
+            help='Вес добавления в список покупок, по умолчанию '
+                 'учитывается только избранное.'
+        )
+
+    def handle(self, *args, **options):
+        if options['top_k'] < 1 or options['chunk_size'] < 1:
+            raise CommandError(
+                '--top-k и --chunk-size должны быть положительными.'
+            )
+        started = time.perf_counter()
+        interactions, recipes, rows = build_similar_recipes(
+            options['top_k'], options['chunk_size'], options['cart_weight']
+        )
+        self.stdout.write(
+            f'Взаимодействий: {interactions}, рецептов: {recipes}, '
+            f'записано пар: {rows}, '
+            f'время: {time.perf_counter() - started:.1f} с'
+        )
@@ -0,0 +1,61 @@
+import os
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from recipes.images import IMAGES_DIR, derivative_names
+from recipes.models import Recipe
+
+
+def walk(storage, path):
+    """Возвращает имена всех файлов в каталоге хранилища и подкаталогах."""
+    directories, files = storage.listdir(path)
+    for name in files:
+        yield os.path.join(path, name)
+    for directory in directories:
+        yield from walk(storage, os.path.join(path, directory))
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет картинки рецептов и их уменьшенные копии, '
+        'на которые не ссылается ни один рецепт.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-age', type=int, default=60,
+            help='Не трогать файлы моложе стольких минут: они могут '
+                 'принадлежать рецептам, которые ещё сохраняются.'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать файлы, ничего не удаляя.'
+        )
+
+    def handle(self, *args, **options):
+        storage = Recipe._meta.get_field('image').storage
+        if not storage.exists(IMAGES_DIR):
+            self.stdout.write('Удалено файлов: 0')
+            return
+        used = set()
+        for name in Recipe.objects.exclude(image='').values_list(
+            'image', flat=True
+        ).order_by().iterator():
+            used.add(name)
+            used.update(derivative_names(name))
+        threshold = timezone.now() - timedelta(minutes=options['min_age'])
+        deleted = 0
+        for name in walk(storage, IMAGES_DIR):
+            if name in used or storage.get_modified_time(name) > threshold:
+                continue
+            if options['verbosity'] > 1 or options['dry_run']:
+                self.stdout.write(name)
+            if not options['dry_run']:
+                storage.delete(name)
+            deleted += 1
+        self.stdout.write(
+            f'{"Будет удалено" if options["dry_run"] else "Удалено"} '
+            f'файлов: {deleted}'
+        )
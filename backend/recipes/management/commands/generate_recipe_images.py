@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import create_derivatives
+from recipes.models import Recipe
+from recipes.tasks import mark_derivatives_ready
+
+
+class Command(BaseCommand):
+    help = 'Создаёт недостающие уменьшенные копии картинок рецептов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Пересоздать и уже существующие копии.'
+        )
+
+    def handle(self, *args, **options):
+        storage = Recipe._meta.get_field('image').storage
+        created = failed = 0
+        for name in Recipe.objects.exclude(image='').values_list(
+            'image', flat=True
+        ).order_by().distinct().iterator():
+            try:
+                created += create_derivatives(name, storage, options['force'])
+                mark_derivatives_ready(name)
+            except OSError as error:
+                failed += 1
+                self.stderr.write(f'{name}: {error}')
+        self.stdout.write(f'Создано файлов: {created}, ошибок: {failed}')
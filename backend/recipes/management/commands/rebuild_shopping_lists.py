@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.shopping_list import rebuild_shopping_lists, verify_shopping_lists
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересобирает списки покупок пользователей по рецептам в корзинах '
+        'или проверяет их на расхождения.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Только проверить списки, ничего не меняя.'
+        )
+        parser.add_argument(
+            '--user', type=int, nargs='+', dest='user_ids',
+            help='id пользователей. По умолчанию - все пользователи.'
+        )
+
+    def handle(self, *args, **options):
+        user_ids = options['user_ids']
+        if not options['verify']:
+            created = rebuild_shopping_lists(user_ids)
+            self.stdout.write(f'Списки покупок пересобраны, строк: {created}')
+            return
+        mismatches = verify_shopping_lists(user_ids)
+        for user_id, ingredient_id, expected, actual in mismatches:
+            self.stdout.write(
+                f'Пользователь {user_id}, ингредиент {ingredient_id}: '
+                f'ожидается {expected}, в списке {actual}'
+            )
+        if mismatches:
+            raise CommandError(f'Найдено расхождений: {len(mismatches)}')
+        self.stdout.write('Расхождений нет')
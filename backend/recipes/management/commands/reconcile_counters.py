@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from recipes.counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = (
+        'Сверяет счётчики избранного, списков покупок, рецептов '
+        'и подписчиков с фактическим количеством строк и исправляет их.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать расхождения, ничего не исправляя.'
+        )
+
+    def handle(self, *args, **options):
+        drift = reconcile_counters(fix=not options['dry_run'])
+        for name, count in drift.items():
+            self.stdout.write(f'{name}: {count}')
+        self.stdout.write(
+            f'{"Расходится" if options["dry_run"] else "Исправлено"} '
+            f'записей: {sum(drift.values())}'
+        )
@@ -0,0 +1,19 @@
+# Generated by Django 3.2 on 2026-10-18 18:05
+
+from django.db import migrations, models
+import recipes.images
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_shoppinglistitem'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(upload_to=recipes.images.recipe_image_path, verbose_name='Картинка'),
+        ),
+    ]
@@ -0,0 +1,73 @@
+from django.db import migrations
+
+# Конфигурация должна совпадать с recipes.search.SEARCH_CONFIG.
+# Вес слов из названия (A) выше, чем из описания (B).
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('russian', coalesce({table}.name, '')), 'A') || "
+    "setweight(to_tsvector('russian', coalesce({table}.text, '')), 'B')"
+)
+
+
+def create_search_vector(apps, schema_editor):
+    """
+    Полнотекстовый поиск рецептов в PostgreSQL.
+
+    Столбец search_vector не объявлен в модели: его заполняет триггер
+    при вставке и изменении названия или описания, в том числе
+    при bulk_create и update(), а в других БД он не нужен.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'ALTER TABLE recipes_recipe '
+        'ADD COLUMN IF NOT EXISTS search_vector tsvector'
+    )
+    schema_editor.execute(
+        'CREATE OR REPLACE FUNCTION recipes_recipe_search_vector_update() '
+        'RETURNS trigger AS $$ BEGIN '
+        f'NEW.search_vector := {SEARCH_VECTOR_SQL.format(table="NEW")}; '
+        'RETURN NEW; END $$ LANGUAGE plpgsql'
+    )
+    schema_editor.execute(
+        'DROP TRIGGER IF EXISTS recipes_recipe_search_vector_trigger '
+        'ON recipes_recipe'
+    )
+    schema_editor.execute(
+        'CREATE TRIGGER recipes_recipe_search_vector_trigger '
+        'BEFORE INSERT OR UPDATE OF name, text ON recipes_recipe '
+        'FOR EACH ROW EXECUTE FUNCTION recipes_recipe_search_vector_update()'
+    )
+    schema_editor.execute(
+        'UPDATE recipes_recipe SET search_vector = '
+        + SEARCH_VECTOR_SQL.format(table='recipes_recipe')
+    )
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS recipe_search_vector_idx '
+        'ON recipes_recipe USING gin (search_vector)'
+    )
+
+
+def drop_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'DROP TRIGGER IF EXISTS recipes_recipe_search_vector_trigger '
+        'ON recipes_recipe'
+    )
+    schema_editor.execute(
+        'DROP FUNCTION IF EXISTS recipes_recipe_search_vector_update()'
+    )
+    schema_editor.execute(
+        'ALTER TABLE recipes_recipe DROP COLUMN IF EXISTS search_vector'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_alter_recipe_image'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_vector, drop_search_vector),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 3.2 on 2026-10-18 22:00
+
+from django.db import migrations, models
+import recipes.images
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_recipeingredientchange'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='derivatives_image',
+            field=models.CharField(blank=True, editable=False, max_length=100, verbose_name='Картинка с готовыми копиями'),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(storage=recipes.images.DeduplicatedFileSystemStorage(), upload_to=recipes.images.recipe_image_path, verbose_name='Картинка'),
+        ),
+    ]
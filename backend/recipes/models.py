@@ -2,17 +2,23 @@ from django.conf import settings
 from django.core.validators import MinValueValidator
 from django.db import models
 
+from foodgram.models import ChangeLogEntry, CounterFieldsMixin
 from ingredients.models import Ingredient
+from recipes.images import recipe_image_path, recipe_image_storage
 from tags.models import Tag
 from users.models import User
 
 
-class Recipe(models.Model):
+class Recipe(CounterFieldsMixin, models.Model):
+    counter_fields = ('favorites_count', 'carts_count')
+
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         related_name='recipes',
         verbose_name='Автор',
+        # Поиск по автору покрывает индекс recipe_author_feed_idx.
+        db_index=False,
     )
     name = models.CharField(
         'Имя',
@@ -20,7 +26,14 @@ class Recipe(models.Model):
     )
     image = models.ImageField(
         'Картинка',
-        upload_to='recipes/',
+        upload_to=recipe_image_path,
+        storage=recipe_image_storage,
+    )
+    derivatives_image = models.CharField(
+        'Картинка с готовыми копиями',
+        max_length=100,
+        blank=True,
+        editable=False,
     )
     text = models.TextField(
         'Текст',
@@ -42,8 +55,42 @@ class Recipe(models.Model):
             )
         ]
     )
+    pub_date = models.DateTimeField(
+        'Дата публикации',
+        auto_now_add=True,
+    )
+    updated_at = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True,
+        db_index=True,
+    )
+    favorites_count = models.IntegerField(
+        'В избранном',
+        default=0,
+        editable=False,
+    )
+    carts_count = models.IntegerField(
+        'В списках покупок',
+        default=0,
+        editable=False,
+    )
 
     class Meta:
+        ordering = ('-pub_date', '-id')
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='recipe_feed_idx'
+            ),
+            models.Index(
+                fields=['-favorites_count', '-pub_date', '-id'],
+                name='recipe_popular_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='recipe_author_feed_idx'
+            ),
+        ]
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
 
@@ -134,3 +181,91 @@ class ShoppingCart(models.Model):
     def __str__(self):
         return (f'{self.user.username} добавил'
                 f'{self.recipe.name} в список покупок')
+
+
+class SimilarRecipe(models.Model):
+    """
+    Похожий рецепт: косинусная близость по совместным добавлениям
+    в избранное. Таблицу заполняет команда build_recommendations.
+    """
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_recipes',
+        verbose_name='Рецепт'
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_to',
+        verbose_name='Похожий рецепт'
+    )
+    score = models.FloatField('Близость')
+
+    class Meta:
+        ordering = ('recipe', '-score')
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'similar'],
+                name='unique_recipe_similar'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['recipe', '-score'], name='similar_recipe_score_idx'
+            ),
+        ]
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+
+    def __str__(self):
+        return f'{self.recipe_id} -> {self.similar_id}: {self.score:.3f}'
+
+
+class ShoppingListItem(models.Model):
+    """
+    Суммарное количество ингредиента в списке покупок пользователя.
+
+    Поддерживается при изменении списка покупок и ингредиентов рецептов,
+    чтобы скачивание списка было одним чтением по индексу.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Юзер'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        verbose_name='Ингредиент'
+    )
+    amount = models.IntegerField('Количество')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_user_ingredient_shopping_list'
+            )
+        ]
+        verbose_name = 'Ингредиент в списке покупок'
+        verbose_name_plural = 'Ингредиенты в списках покупок'
+
+    def __str__(self):
+        return f'{self.ingredient.name} - {self.amount}'
+
+
+class RecipeIngredientChange(ChangeLogEntry):
+    """
+    Рецепты, у которых изменились ингредиенты: по этому журналу процессы
+    обновляют индекс recipes.ingredient_index.
+    """
+
+    class Meta:
+        verbose_name = 'Изменение ингредиентов рецептов'
+        verbose_name_plural = 'Изменения ингредиентов рецептов'
+
+    def __str__(self):
+        return f'{self.pk}: {self.object_ids}'
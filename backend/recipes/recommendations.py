@@ -0,0 +1,113 @@
+from array import array
+
+import numpy as np
+from scipy import sparse
+
+from django.db import transaction
+
+from recipes.models import Favorite, ShoppingCart, SimilarRecipe
+
+BATCH_SIZE = 10000
+
+
+def load_interactions(cart_weight=0.0):
+    """
+    Читает взаимодействия пользователей с рецептами.
+
+    Избранное даёт вес 1, список покупок - cart_weight.
+    Строки читаются из БД порциями в компактные массивы,
+    а не в список Python-объектов.
+    """
+    users, recipes, weights = array('q'), array('q'), array('d')
+    sources = [(Favorite, 1.0)]
+    if cart_weight:
+        sources.append((ShoppingCart, cart_weight))
+    for model, weight in sources:
+        for user_id, recipe_id in model.objects.values_list(
+            'user_id', 'recipe_id'
+        ).order_by().iterator(chunk_size=BATCH_SIZE):
+            users.append(user_id)
+            recipes.append(recipe_id)
+            weights.append(weight)
+    return (
+        np.frombuffer(users, dtype=np.int64),
+        np.frombuffer(recipes, dtype=np.int64),
+        np.frombuffer(weights, dtype=np.float64),
+    )
+
+
+def build_matrix(users, recipes, weights):
+    """
+    Строит разреженную матрицу пользователь x рецепт.
+
+    Столбцы нормированы, поэтому произведение столбцов - косинусная
+    близость рецептов. Возвращает id рецептов по столбцам и матрицу.
+    """
+    recipe_ids, columns = np.unique(recipes, return_inverse=True)
+    user_ids, rows = np.unique(users, return_inverse=True)
+    matrix = sparse.csr_matrix(
+        (weights, (rows.ravel(), columns.ravel())),
+        shape=(len(user_ids), len(recipe_ids))
+    )
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0))).ravel()
+    return recipe_ids, (matrix @ sparse.diags(1 / norms)).tocsc()
+
+
+def top_similar(matrix, top_k, chunk_size):
+    """
+    Возвращает для каждого столбца top_k самых близких столбцов.
+
+    Близость считается блоками по chunk_size рецептов, поэтому
+    в памяти одновременно только одна полоса матрицы близости.
+    Выдаёт тройки (столбец, столбцы похожих, близости).
+    """
+    transposed = matrix.T.tocsr()
+    for start in range(0, matrix.shape[1], chunk_size):
+        block = (transposed[start:start + chunk_size] @ matrix).tocsr()
+        for offset in range(block.shape[0]):
+            begin, end = block.indptr[offset], block.indptr[offset + 1]
+            columns = block.indices[begin:end]
+            scores = block.data[begin:end]
+            keep = columns != start + offset
+            columns, scores = columns[keep], scores[keep]
+            if len(scores) > top_k:
+                best = np.argpartition(-scores, top_k - 1)[:top_k]
+                columns, scores = columns[best], scores[best]
+            order = np.argsort(-scores, kind='stable')
+            yield start + offset, columns[order], scores[order]
+
+
+def build_similar_recipes(top_k, chunk_size, cart_weight=0.0):
+    """
+    Пересчитывает таблицу похожих рецептов.
+
+    Старые строки заменяются в одной транзакции, поэтому API
+    всё время отдаёт либо старый, либо новый результат целиком.
+    Возвращает (число взаимодействий, число рецептов, число строк).
+    """
+    users, recipes, weights = load_interactions(cart_weight)
+    if not len(users):
+        SimilarRecipe.objects.all().delete()
+        return 0, 0, 0
+    recipe_ids, matrix = build_matrix(users, recipes, weights)
+    created = 0
+    with transaction.atomic():
+        SimilarRecipe.objects.all().delete()
+        batch = []
+        for column, columns, scores in top_similar(
+            matrix, top_k, chunk_size
+        ):
+            batch.extend(
+                SimilarRecipe(
+                    recipe_id=int(recipe_ids[column]),
+                    similar_id=int(recipe_ids[similar]),
+                    score=float(score),
+                )
+                for similar, score in zip(columns, scores)
+            )
+            if len(batch) >= BATCH_SIZE:
+                SimilarRecipe.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        SimilarRecipe.objects.bulk_create(batch)
+    return len(users), len(recipe_ids), created + len(batch)
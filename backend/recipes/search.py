@@ -0,0 +1,68 @@
+from functools import reduce
+from operator import add
+
+from django.db import connections
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+
+from recipes.models import Recipe
+
+SEARCH_CONFIG = 'russian'
+
+
+def search_recipes(queryset, value):
+    """
+    Оставляет рецепты, подходящие под поисковый запрос, и сортирует
+    их по релевантности.
+
+    В PostgreSQL поиск идёт по столбцу search_vector с GIN-индексом,
+    который поддерживает триггер (см. миграцию 0006). В остальных БД
+    слова запроса ищутся подстрокой в названии и описании; SQLite
+    при этом не различает регистр только у латиницы.
+    """
+    if connections[queryset.db].vendor == 'postgresql':
+        return search_postgresql(queryset, value)
+    return search_fallback(queryset, value)
+
+
+def search_postgresql(queryset, value):
+    # Модуль импортирует psycopg2, который нужен только с PostgreSQL.
+    from django.contrib.postgres.search import (
+        SearchQuery,
+        SearchRank,
+        SearchVectorField,
+    )
+
+    query = SearchQuery(value, config=SEARCH_CONFIG, search_type='websearch')
+    vector = RawSQL(
+        f'{Recipe._meta.db_table}.search_vector', (),
+        output_field=SearchVectorField()
+    )
+    return queryset.alias(
+        search_vector=vector
+    ).filter(
+        search_vector=query
+    ).annotate(
+        search_rank=SearchRank(vector, query)
+    ).order_by('-search_rank', '-pub_date', '-id')
+
+
+def search_fallback(queryset, value):
+    words = value.split()
+    if not words:
+        return queryset
+    for word in words:
+        queryset = queryset.filter(
+            Q(name__icontains=word) | Q(text__icontains=word)
+        )
+    rank = reduce(add, (
+        Case(
+            When(name__icontains=word, then=Value(2)),
+            default=Value(1),
+            output_field=IntegerField(),
+        )
+        for word in words
+    ))
+    return queryset.annotate(
+        search_rank=rank
+    ).order_by('-search_rank', '-pub_date', '-id')
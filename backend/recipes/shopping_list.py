@@ -0,0 +1,187 @@
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+from django.dispatch import Signal
+from django.utils import timezone
+
+from recipes.ingredient_index import recipe_ingredient_index
+from recipes.models import (
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+    ShoppingListItem,
+)
+from users.models import User
+
+BATCH_SIZE = 1000
+# Ингредиенты рецептов recipe_ids изменились в обход сериализатора
+# рецепта (в админке). Аргументы: recipe_ids.
+recipe_ingredients_changed = Signal()
+
+
+def get_recipe_amounts(recipe_ids):
+    """Возвращает {id ингредиента: количество} для набора рецептов."""
+    return dict(
+        RecipeIngredient.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list('ingredient_id').annotate(
+            total=Sum('amount')
+        ).order_by()
+    )
+
+
+def change_shopping_lists(user_ids, deltas):
+    """
+    Прибавляет deltas {id ингредиента: количество} к спискам покупок.
+
+    Строки пользователей блокируются, чтобы параллельные изменения
+    одного списка не теряли друг друга. Строки с нулевым
+    количеством удаляются.
+    """
+    deltas = {pk: amount for pk, amount in deltas.items() if amount}
+    if not deltas:
+        return
+    user_ids = sorted(set(user_ids))
+    if not user_ids:
+        return
+    with transaction.atomic():
+        list(User.objects.select_for_update().filter(
+            pk__in=user_ids
+        ).order_by('pk').values_list('pk', flat=True))
+        items = ShoppingListItem.objects.filter(
+            user_id__in=user_ids, ingredient_id__in=deltas
+        )
+        items.update(amount=F('amount') + Case(
+            *(When(ingredient_id=pk, then=Value(amount))
+              for pk, amount in deltas.items()),
+            output_field=IntegerField()
+        ))
+        existing = set(items.values_list('user_id', 'ingredient_id'))
+        ShoppingListItem.objects.bulk_create(
+            (
+                ShoppingListItem(user_id=user_id, ingredient_id=pk,
+                                 amount=amount)
+                for user_id in user_ids
+                for pk, amount in deltas.items()
+                if amount > 0 and (user_id, pk) not in existing
+            ),
+            batch_size=BATCH_SIZE
+        )
+        items.filter(amount__lte=0).delete()
+
+
+def add_to_shopping_list(user_id, recipe_ids, sign=1):
+    """Добавляет (sign=-1 - убирает) рецепты в список покупок."""
+    change_shopping_lists([user_id], {
+        pk: sign * amount
+        for pk, amount in get_recipe_amounts(recipe_ids).items()
+    })
+
+
+def change_recipe_in_shopping_lists(recipe_id, deltas):
+    """
+    Применяет изменение ингредиентов рецепта ко всем спискам покупок,
+    в которых он есть.
+    """
+    change_shopping_lists(
+        ShoppingCart.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('user_id', flat=True),
+        deltas
+    )
+
+
+@contextmanager
+def track_recipe_ingredients(recipe_ids):
+    """
+    Переносит изменения ингредиентов рецептов в списки покупок.
+
+    Сравнивает ингредиенты каждого рецепта до и после блока и применяет
+    разницу ко всем пользователям, у которых рецепт в списке покупок.
+    Рецепты также обновляются в индексе поиска по ингредиентам.
+    У рецептов, ингредиенты которых изменились, обновляется updated_at
+    (от него зависят ETag и Last-Modified) и отправляется
+    recipe_ingredients_changed.
+    """
+    recipe_ids = {pk for pk in recipe_ids if pk}
+    before = {pk: get_recipe_amounts([pk]) for pk in recipe_ids}
+    yield
+    changed = set()
+    for recipe_id in recipe_ids:
+        after = get_recipe_amounts([recipe_id])
+        if after != before[recipe_id]:
+            changed.add(recipe_id)
+        change_recipe_in_shopping_lists(recipe_id, {
+            pk: after.get(pk, 0) - before[recipe_id].get(pk, 0)
+            for pk in before[recipe_id].keys() | after.keys()
+        })
+    recipe_ingredient_index.refresh(recipe_ids)
+    if changed:
+        Recipe.objects.filter(pk__in=changed).update(
+            updated_at=timezone.now()
+        )
+        recipe_ingredients_changed.send(sender=Recipe, recipe_ids=changed)
+
+
+def get_expected_items(user_ids=None):
+    """Считает списки покупок с нуля по рецептам в корзинах."""
+    filters = {'recipe__carts__isnull': False}
+    if user_ids:
+        filters['recipe__carts__user_id__in'] = user_ids
+    return RecipeIngredient.objects.filter(**filters).values_list(
+        'recipe__carts__user_id', 'ingredient_id'
+    ).annotate(total=Sum('amount')).order_by()
+
+
+def rebuild_shopping_lists(user_ids=None):
+    """Пересобирает списки покупок с нуля и возвращает число строк."""
+    with transaction.atomic():
+        items = ShoppingListItem.objects.all()
+        if user_ids:
+            items = items.filter(user_id__in=user_ids)
+        items.delete()
+        created = 0
+        batch = []
+        for user_id, ingredient_id, amount in get_expected_items(
+            user_ids
+        ).iterator(chunk_size=BATCH_SIZE):
+            batch.append(ShoppingListItem(
+                user_id=user_id, ingredient_id=ingredient_id, amount=amount
+            ))
+            if len(batch) == BATCH_SIZE:
+                ShoppingListItem.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        ShoppingListItem.objects.bulk_create(batch)
+        return created + len(batch)
+
+
+def verify_shopping_lists(user_ids=None):
+    """
+    Сравнивает списки покупок с пересчитанными с нуля.
+
+    Возвращает список расхождений (пользователь, ингредиент,
+    ожидаемое количество, фактическое количество).
+    """
+    actual = ShoppingListItem.objects.all()
+    if user_ids:
+        actual = actual.filter(user_id__in=user_ids)
+    actual = {
+        (user_id, ingredient_id): amount
+        for user_id, ingredient_id, amount in actual.values_list(
+            'user_id', 'ingredient_id', 'amount'
+        ).iterator(chunk_size=BATCH_SIZE)
+    }
+    mismatches = []
+    for user_id, ingredient_id, amount in get_expected_items(
+        user_ids
+    ).iterator(chunk_size=BATCH_SIZE):
+        current = actual.pop((user_id, ingredient_id), None)
+        if current != amount:
+            mismatches.append((user_id, ingredient_id, amount, current))
+    mismatches.extend(
+        (user_id, ingredient_id, None, amount)
+        for (user_id, ingredient_id), amount in actual.items()
+    )
+    return mismatches
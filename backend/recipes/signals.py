@@ -0,0 +1,89 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from ingredients.models import Ingredient
+from jobs.queue import enqueue
+from recipes.counters import RECIPE_COUNTERS, change_counter
+from recipes.images import derivative_names
+from recipes.ingredient_index import recipe_ingredient_index
+from recipes.models import Favorite, Recipe, RecipeIngredient, ShoppingCart
+from recipes.shopping_list import add_to_shopping_list
+from users.models import User
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_recipe_to_shopping_list(instance, created, **kwargs):
+    if created:
+        add_to_shopping_list(instance.user_id, [instance.recipe_id])
+
+
+@receiver(post_save, sender=Recipe)
+def create_recipe_image_derivatives(instance, **kwargs):
+    """
+    Ставит в очередь создание копий новой картинки.
+
+    Если копии этой картинки уже есть (её загружали раньше),
+    рецепт сразу отмечается как готовый.
+    """
+    name = instance.image.name
+    if not name or instance.derivatives_image == name:
+        return
+    if all(
+        instance.image.storage.exists(derivative)
+        for derivative in derivative_names(name)
+    ):
+        Recipe.objects.filter(pk=instance.pk).update(derivatives_image=name)
+        instance.derivatives_image = name
+        return
+    enqueue(
+        'recipes.create_image_derivatives', {'name': name},
+        dedup_key=f'image-derivatives:{name}'
+    )
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_from_ingredient_index(instance, **kwargs):
+    recipe_ingredient_index.refresh([instance.pk])
+
+
+@receiver(pre_delete, sender=Ingredient)
+def refresh_ingredient_recipes(instance, **kwargs):
+    """Ингредиент каскадно удаляется из рецептов в обход их сохранения."""
+    recipe_ingredient_index.refresh(
+        RecipeIngredient.objects.filter(
+            ingredient=instance
+        ).values_list('recipe_id', flat=True)
+    )
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def remove_recipe_from_shopping_list(instance, **kwargs):
+    add_to_shopping_list(instance.user_id, [instance.recipe_id], sign=-1)
+
+
+# Счётчики меняются здесь при изменениях через ORM (админка, каскадное
+# удаление). API меняет коллекции через recipes.bulk, минуя сигналы.
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+def increase_recipe_counter(sender, instance, created, **kwargs):
+    if created:
+        change_counter(
+            Recipe, [instance.recipe_id], RECIPE_COUNTERS[sender], 1
+        )
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+def decrease_recipe_counter(sender, instance, **kwargs):
+    change_counter(Recipe, [instance.recipe_id], RECIPE_COUNTERS[sender], -1)
+
+
+@receiver(post_save, sender=Recipe)
+def increase_author_recipes_count(instance, created, **kwargs):
+    if created:
+        change_counter(User, [instance.author_id], 'recipes_count', 1)
+
+
+@receiver(post_delete, sender=Recipe)
+def decrease_author_recipes_count(instance, **kwargs):
+    change_counter(User, [instance.author_id], 'recipes_count', -1)
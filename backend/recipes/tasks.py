@@ -0,0 +1,36 @@
+from jobs.queue import task
+from recipes.counters import reconcile_counters
+from recipes.images import create_derivatives
+from recipes.models import Recipe
+from recipes.shopping_list import rebuild_shopping_lists
+
+
+def mark_derivatives_ready(name):
+    """
+    Отмечает рецепты с картинкой name: её копии готовы.
+
+    Рецепты сохраняются с updated_at, поэтому меняются их ETag
+    и сбрасывается кэш ответов.
+    """
+    for recipe in Recipe.objects.filter(image=name).exclude(
+        derivatives_image=name
+    ):
+        recipe.derivatives_image = name
+        recipe.save(update_fields=('derivatives_image', 'updated_at'))
+
+
+@task('recipes.create_image_derivatives', max_attempts=3)
+def create_image_derivatives(name):
+    created = create_derivatives(name)
+    mark_derivatives_ready(name)
+    return {'created': created}
+
+
+@task('recipes.rebuild_shopping_lists')
+def rebuild_shopping_lists_task(user_ids=None):
+    return {'rows': rebuild_shopping_lists(user_ids)}
+
+
+@task('recipes.reconcile_counters')
+def reconcile_counters_task():
+    return reconcile_counters()
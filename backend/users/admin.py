@@ -3,6 +3,7 @@ from django.contrib import admin
 from django.contrib.auth import get_user_model
 
 from .models import Subscription
+from foodgram.paginator import EstimatedCountPaginator
 
 User = get_user_model()
 
@@ -10,8 +11,11 @@ User = get_user_model()
 @admin.register(Subscription)
 class SubscriptionAdmin(admin.ModelAdmin):
     list_display = ('pk', 'user', 'author')
-    search_fields = ('user', 'author')
-    list_filter = ('user', 'author')
+    search_fields = ('^user__username', '^author__username')
+    list_select_related = ('user', 'author')
+    autocomplete_fields = ('user', 'author')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = settings.EMPTY_VALUE
     verbose_name = 'Подписка'
 
@@ -19,9 +23,13 @@ class SubscriptionAdmin(admin.ModelAdmin):
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
     list_display = (
-        'pk', 'email', 'username', 'first_name', 'last_name')
-    search_fields = ('username', 'email', 'first_name', 'last_name')
-    list_filter = ('username', 'email')
+        'pk', 'email', 'username', 'first_name', 'last_name',
+        'recipes_count', 'followers_count')
+    search_fields = ('^username', '^email', 'first_name', 'last_name')
+    list_filter = ('is_staff', 'is_active')
+    readonly_fields = ('recipes_count', 'followers_count')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = settings.EMPTY_VALUE
     verbose_name = 'Пользователь'
 
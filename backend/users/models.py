@@ -2,10 +2,13 @@ from django.contrib.auth.models import AbstractUser
 from django.core.exceptions import ValidationError
 from django.db import models
 
+from foodgram.models import CounterFieldsMixin
 from users.validators import validate_username
 
 
-class User(AbstractUser):
+class User(CounterFieldsMixin, AbstractUser):
+    counter_fields = ('recipes_count', 'followers_count')
+
     email = models.EmailField(
         'Электронная почта',
         max_length=254,
@@ -25,6 +28,16 @@ class User(AbstractUser):
         'Фамилия',
         max_length=150,
     )
+    recipes_count = models.IntegerField(
+        'Количество рецептов',
+        default=0,
+        editable=False,
+    )
+    followers_count = models.IntegerField(
+        'Количество подписчиков',
+        default=0,
+        editable=False,
+    )
 
     class Meta:
         verbose_name = 'Пользователь'
@@ -0,0 +1,16 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from recipes.counters import change_counter
+from users.models import Subscription, User
+
+
+@receiver(post_save, sender=Subscription)
+def increase_followers_count(instance, created, **kwargs):
+    if created:
+        change_counter(User, [instance.author_id], 'followers_count', 1)
+
+
+@receiver(post_delete, sender=Subscription)
+def decrease_followers_count(instance, **kwargs):
+    change_counter(User, [instance.author_id], 'followers_count', -1)